@@ -0,0 +1,107 @@
+DOT = '.'
+
+
+def compress_ranges(chars) -> str:
+    """
+    Writes a set of characters the way it is written inside [], runs of 3 or more become ranges
+    {a, b, c, d, 5} -> '5a-d'
+    """
+    codes = sorted(ord(ch) for ch in chars)
+    ret = []
+    i = 0
+    while i < len(codes):
+        j = i
+        while j + 1 < len(codes) and codes[j + 1] == codes[j] + 1:
+            j += 1
+        if j - i >= 2:
+            ret.append(f'{chr(codes[i])}-{chr(codes[j])}')
+        else:
+            ret.extend(chr(c) for c in codes[i:j + 1])
+        i = j + 1
+    return ''.join(ret)
+
+
+def parse_label(label: str) -> tuple[frozenset[str], bool]:
+    """
+    Returns the characters written in an edge label and whether the label matches everything except them
+    'a' -> ({a}, False), '[a-c5]' -> ({a, b, c, 5}, False), '.' -> ({}, True), '[^ab]' -> ({a, b}, True)
+    """
+    if label == DOT:
+        return frozenset(), True
+    if len(label) < 2 or label[0] != '[' or label[-1] != ']':
+        return frozenset(label), False
+    body = label[1:-1]
+    negated = body.startswith('^')
+    if negated:
+        body = body[1:]
+    chars = set()
+    i = 0
+    while i < len(body):
+        if i + 2 < len(body) and body[i + 1] == '-':
+            chars.update(chr(c) for c in range(ord(body[i]), ord(body[i + 2]) + 1))
+            i += 3
+        else:
+            chars.add(body[i])
+            i += 1
+    return frozenset(chars), negated
+
+
+class Alphabet:
+    """
+    Splits the characters matched by a set of edge labels into disjoint symbol classes
+    two characters are in the same class if every label matches both of them or none of them
+    class 0 is the 'other' class, all the characters that no label names explicitly
+    (only '.' and negated labels match it)
+    """
+
+    OTHER = 0
+
+    def __init__(self, labels: list[str]):
+        self.labels = list(labels)
+        parsed = [parse_label(label) for label in self.labels]
+        explicit = set()
+        for chars, _ in parsed:
+            explicit.update(chars)
+
+        # the labels matching the other class
+        other_signature = tuple(i for i, (_, negated) in enumerate(parsed) if negated)
+        signature2Class = {other_signature: Alphabet.OTHER}
+        # class -> the characters in it, empty for the other class
+        self.classes: list[set[str]] = [set()]
+        # char -> class, characters missing here are in the other class
+        self.char_class: dict[str, int] = {}
+        for ch in sorted(explicit):
+            signature = tuple(i for i, (chars, negated) in enumerate(parsed) if (ch in chars) != negated)
+            if signature == other_signature:
+                # behaves exactly like a character no label mentions
+                continue
+            if signature not in signature2Class:
+                signature2Class[signature] = len(self.classes)
+                self.classes.append(set())
+            self.char_class[ch] = signature2Class[signature]
+            self.classes[signature2Class[signature]].add(ch)
+
+        # label -> the classes it matches
+        self.label_classes: dict[str, list[int]] = {label: [] for label in self.labels}
+        for signature, c in signature2Class.items():
+            for i in signature:
+                self.label_classes[self.labels[i]].append(c)
+
+        # a readable label for every class, the labels of different classes never overlap
+        self.class_labels: list[str] = [self.make_class_label(c) for c in range(len(self.classes))]
+
+    def make_class_label(self, c: int) -> str:
+        if c == Alphabet.OTHER:
+            if not self.char_class:
+                return DOT
+            return f'[^{compress_ranges(self.char_class.keys())}]'
+        if len(self.classes[c]) == 1:
+            return next(iter(self.classes[c]))
+        return f'[{compress_ranges(self.classes[c])}]'
+
+    @property
+    def num_classes(self) -> int:
+        return len(self.classes)
+
+    def class_of(self, ch: str) -> int:
+        return self.char_class.get(ch, Alphabet.OTHER)
@@ -0,0 +1,117 @@
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+from typing import Callable
+import automaton_format
+import compiler
+from matcher import DFAMatcher
+
+# change it whenever the compiled tables of the same pattern can change, old cache entries are then ignored
+COMPILER_VERSION = '1'
+
+
+def compile_matcher(pattern: str) -> DFAMatcher:
+    return compiler.compile(pattern).matcher
+
+
+class AutomatonCache:
+    """
+    Caches compiled `DFAMatcher`s keyed by the pattern text, `COMPILER_VERSION` and namespace
+    the in-process cache keeps the max_entries most recently used matchers
+    if a directory is given the tables are also stored there, one file per pattern, so a
+    restarted process doesn't compile them again
+    a file is written to a temporary name then renamed, it uses the binary format of `automaton_format`
+    files that fail its checksum are treated as missing
+    caches with a custom compiler should use their own namespace, so that they don't share files in directory
+    with caches that compile the same patterns differently
+    """
+
+    def __init__(self, max_entries: int = 256, directory: str = None, compiler: Callable[[str], DFAMatcher] = compile_matcher,
+                 namespace: str = ''):
+        self.max_entries = max_entries
+        self.directory = directory
+        self.compiler = compiler
+        self.namespace = namespace
+        self.entries: OrderedDict[str, DFAMatcher] = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.corrupted = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def key(self, pattern: str) -> str:
+        return hashlib.sha256(f'{COMPILER_VERSION}\0{self.namespace}\0{pattern}'.encode()).hexdigest()
+
+    def get(self, pattern: str) -> DFAMatcher:
+        """
+        Returns the matcher of a pattern, compiling it only if neither cache has it
+        """
+        key = self.key(pattern)
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        matcher = self.load(key)
+        if matcher is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            matcher = self.compiler(pattern)
+            self.store(key, matcher)
+        self.put(key, matcher)
+        return matcher
+
+    def put(self, key: str, matcher: DFAMatcher):
+        self.entries[key] = matcher
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.rtxa')
+
+    def load(self, key: str) -> DFAMatcher:
+        if self.directory is None or not os.path.exists(self.path(key)):
+            return None
+        try:
+            return automaton_format.load(self.path(key))
+        except Exception:
+            self.corrupted += 1
+            return None
+
+    def store(self, key: str, matcher: DFAMatcher):
+        if self.directory is None:
+            return
+        payload = automaton_format.to_bytes(matcher)
+        # write next to the final file so the rename stays on the same file system
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(payload)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_path, self.path(key))
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def clear(self):
+        """
+        Empties the in-process cache, the files on disk are kept
+        """
+        self.entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "diskHits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "corrupted": self.corrupted,
+        }
@@ -0,0 +1,114 @@
+import json
+import mmap
+import struct
+import sys
+import zlib
+from array import array
+from alphabet import Alphabet
+from matcher import DFAMatcher
+
+# file layout, all integers are little endian and every section starts at a multiple of 4
+#   header   magic, version, flags, num_states, num_classes, start, labels size, crc32 of everything else
+#   labels   the edge labels of the alphabet as a json list (utf-8), they define the symbol class map
+#   table    num_states * num_classes int32, table[state * num_classes + class] is the next state or DEAD
+#   accept   bitmap, bit s & 7 of byte s >> 3 is set if s is a terminating state
+#   tags     num_states int32, only present with FLAG_TAGS
+MAGIC = b'RTXA'
+VERSION = 1
+FLAG_TAGS = 1
+HEADER = struct.Struct('<4sHHIIiII')
+
+
+def align(size: int) -> int:
+    return (size + 3) & ~3
+
+
+def checksum(header, body) -> int:
+    """
+    The crc32 of the header without its last field (the checksum itself) followed by the body
+    """
+    return zlib.crc32(body, zlib.crc32(header[:HEADER.size - 4]))
+
+
+def to_bytes(matcher: DFAMatcher) -> bytes:
+    n, k = matcher.num_states, matcher.num_classes
+    labels = json.dumps(matcher.alphabet.labels, separators=(',', ':')).encode()
+    table = array('i', matcher.table)
+    tags = array('i', matcher.tags) if matcher.tags is not None else None
+    if sys.byteorder != 'little':
+        table.byteswap()
+        if tags is not None:
+            tags.byteswap()
+    accept = bytearray((n + 7) >> 3)
+    for s in range(n):
+        if matcher.accepting[s]:
+            accept[s >> 3] |= 1 << (s & 7)
+
+    body = bytearray(labels)
+    body += bytes(align(len(body)) - len(body))
+    body += table.tobytes()
+    body += accept
+    if tags is not None:
+        body += bytes(align(len(body)) - len(body))
+        body += tags.tobytes()
+    flags = FLAG_TAGS if tags is not None else 0
+    header = HEADER.pack(MAGIC, VERSION, flags, n, k, matcher.start, len(labels), 0)
+    return HEADER.pack(MAGIC, VERSION, flags, n, k, matcher.start, len(labels), checksum(header, body)) + body
+
+
+def from_buffer(buffer, verify: bool = True) -> DFAMatcher:
+    """
+    Reads a matcher from bytes or an mmap, the table and the tags are views on buffer and are not copied
+    with verify the crc32 of the header and the body is checked
+    """
+    view = memoryview(buffer)
+    if len(view) < HEADER.size:
+        raise Exception("Truncated automaton file")
+    magic, version, flags, n, k, start, labels_size, crc = HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise Exception("Not an automaton file")
+    if version != VERSION:
+        raise Exception(f"Unsupported automaton file version {version}")
+    if verify and checksum(view[:HEADER.size], view[HEADER.size:]) != crc:
+        raise Exception("Automaton file checksum mismatch")
+
+    labels_offset = HEADER.size
+    table_offset = labels_offset + align(labels_size)
+    accept_offset = table_offset + 4 * n * k
+    tags_offset = align(accept_offset + ((n + 7) >> 3))
+    end = tags_offset + 4 * n if flags & FLAG_TAGS else accept_offset + ((n + 7) >> 3)
+    if len(view) < end:
+        raise Exception("Truncated automaton file")
+
+    labels = json.loads(bytes(view[labels_offset:labels_offset + labels_size]))
+    alphabet = Alphabet(labels)
+    if alphabet.num_classes != k:
+        raise Exception("Automaton file symbol classes don't match its labels")
+    table = view[table_offset:accept_offset].cast('i')
+    tags = view[tags_offset:end].cast('i') if flags & FLAG_TAGS else None
+    if sys.byteorder != 'little':
+        table = array('i', table)
+        table.byteswap()
+        if tags is not None:
+            tags = array('i', tags)
+            tags.byteswap()
+    accept = view[accept_offset:accept_offset + ((n + 7) >> 3)]
+    accepting = bytearray((accept[s >> 3] >> (s & 7)) & 1 for s in range(n))
+    return DFAMatcher(alphabet, n, start, table, accepting, tags)
+
+
+def save(matcher: DFAMatcher, path: str):
+    with open(path, 'wb') as file:
+        file.write(to_bytes(matcher))
+
+
+def load(path: str, verify: bool = True) -> DFAMatcher:
+    """
+    Maps the file in memory and reads the matcher from it, the mapping stays open as long as the matcher uses it
+    """
+    with open(path, 'rb') as file:
+        try:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            buffer = file.read()
+    return from_buffer(buffer, verify)
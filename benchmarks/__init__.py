@@ -0,0 +1,3 @@
+"""
+Benchmarks of every compile stage, run them with python -m benchmarks.run
+"""
@@ -0,0 +1,99 @@
+import string
+from typing import Callable
+
+LETTERS = string.ascii_lowercase
+
+
+def word(i: int) -> str:
+    """
+    The i-th word of a, b, ..., z, ba, bb, ... (distinct words for distinct i)
+    """
+    ret = LETTERS[i % 26]
+    i //= 26
+    while i:
+        ret = LETTERS[i % 26] + ret
+        i //= 26
+    return ret
+
+
+def literal_chain(n: int) -> str:
+    """
+    n letters in a row, abc...zab...
+    """
+    return ''.join(LETTERS[i % 26] for i in range(n))
+
+
+def wide_alternation(n: int) -> str:
+    """
+    n different words separated by |
+    """
+    return '|'.join(word(i) + 'x' for i in range(n))
+
+
+def nested_stars(n: int) -> str:
+    """
+    n + 1 stars nested in each other, ((a*b)*c)* for n = 2
+    """
+    ret = 'a'
+    for i in range(1, n + 1):
+        ret = f'({ret}*{LETTERS[i % 26]})' if i < n else f'({ret}*{LETTERS[i % 26]})*'
+    return ret
+
+
+def exponential(n: int) -> str:
+    """
+    (a|b)*a(a|b){n}, the minimal DFA has 2^(n+1) states
+    """
+    return '(a|b)*a' + '(a|b)' * n
+
+
+def large_classes(n: int) -> str:
+    """
+    A star over n overlapping character classes, every class is a window of 8 letters or digits
+    sliding one character at a time, so they split the alphabet into many symbol classes
+    """
+    chars = string.digits + string.ascii_uppercase + string.ascii_lowercase
+    blocks = [string.digits, string.ascii_uppercase, string.ascii_lowercase]
+    classes = []
+    for i in range(n):
+        block = blocks[i % 3]
+        start = (i // 3) % (len(block) - 7)
+        classes.append(f'[{block[start]}-{block[start + 7]}{chars[(5 * i) % len(chars)]}]')
+    return '(' + '|'.join(classes) + ')*' + literal_chain(3)
+
+
+GENERATORS: dict[str, Callable[[int], str]] = {
+    'literal_chain': literal_chain,
+    'wide_alternation': wide_alternation,
+    'nested_stars': nested_stars,
+    'exponential': exponential,
+    'large_classes': large_classes,
+}
+
+# generator -> sizes, quick runs in seconds, full and long in minutes
+SIZES: dict[str, dict[str, list[int]]] = {
+    'quick': {
+        'literal_chain': [50, 200],
+        'wide_alternation': [20, 100],
+        'nested_stars': [4, 8],
+        'exponential': [4, 8],
+        'large_classes': [6, 18],
+    },
+    'full': {
+        'literal_chain': [100, 500, 2000],
+        'wide_alternation': [50, 200, 800],
+        'nested_stars': [4, 8, 16],
+        'exponential': [4, 8, 11],
+        'large_classes': [6, 18, 45],
+    },
+    # the closures and subsets of long patterns have to stay close to linear in their length
+    'long': {
+        'literal_chain': [4000, 16000],
+        'wide_alternation': [3000],
+    },
+}
+
+# preset -> the stages it doesn't run, the moore minimizer is quadratic and would take hours on long patterns
+SKIPPED_STAGES: dict[str, set[str]] = {
+    'long': {'minimize_moore'},
+}
@@ -0,0 +1,160 @@
+import argparse
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+from typing import Callable
+from benchmarks.patterns import GENERATORS, SIZES, SKIPPED_STAGES
+from compact_nfa import EpsilonClosures
+from dfa_generator import dfa_generator, DFA_Minimizer
+from direct_dfa import DirectDFA
+from matcher import DFAMatcher
+from reg_parser import Validator, RegParser
+
+
+def measure(fn: Callable, repeat: int) -> tuple[float, int, object]:
+    """
+    Returns the best time of repeat calls, the peak memory allocated by one more call under tracemalloc and its result
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        result = fn()
+        peak = tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+    return best, peak, result
+
+
+def minimize(dfa, engine: str) -> DFA_Minimizer:
+    minimizer = DFA_Minimizer(dfa, engine)
+    minimizer.minimize()
+    return minimizer
+
+
+def bench_pattern(pattern: str, repeat: int, workers: int = 2, batch_size: int = 16,
+                  skip: set[str] = frozenset()) -> list[dict]:
+    """
+    Times every compile stage of one pattern but the ones in skip, each stage gets the output of the previous one
+    convert_to_dfa_parallel runs the subset construction with workers processes and batches of batch_size groups,
+    the pool only expands the levels big enough for it (see `dfa_generator.convert_to_dfa`)
+    """
+    rows = []
+
+    def stage(name: str, fn: Callable, counts: Callable = None):
+        if name in skip:
+            return None
+        seconds, peak, result = measure(fn, repeat)
+        row = {"stage": name, "seconds": seconds, "peakBytes": peak}
+        if counts is not None:
+            row.update(counts(result))
+        rows.append(row)
+        return result
+
+    stage('validate', lambda: Validator.validate(pattern))
+    parser = RegParser(pattern)
+    stage('build', parser.build)
+
+    def parse():
+        # parse appends its states to parser.states, every call has to start from none
+        parser.states = []
+        return parser.parse()
+
+    stage('parse', parse, lambda nfa: {"states": len(nfa) - 1})
+    nfa = stage('parse_compact', parser.parse_compact,
+                lambda nfa: {"states": nfa.num_states, "edges": nfa.num_edges, "epsEdges": nfa.num_eps_edges})
+    stage('closures', lambda: EpsilonClosures(nfa), lambda closures: {"closures": closures.num_components})
+    stage('parse_glushkov', lambda: parser.parse_compact('glushkov'),
+          lambda nfa: {"states": nfa.num_states, "edges": nfa.num_edges, "epsEdges": nfa.num_eps_edges})
+    dfa = stage('convert_to_dfa', lambda: dfa_generator(nfa=nfa).convert_to_dfa(),
+                lambda dfa: {"states": len(dfa.states)})
+    stage('convert_to_dfa_parallel', lambda: dfa_generator(nfa=nfa).convert_to_dfa(workers, batch_size),
+          lambda dfa: {"states": len(dfa.states)})
+    stage('direct_dfa', lambda: DirectDFA(parser).convert_to_dfa(), lambda dfa: {"states": len(dfa.states)})
+    minimizer = None
+    for engine in DFA_Minimizer.engines:
+        minimizer = stage(f'minimize_{engine}', lambda: minimize(dfa, engine),
+                          lambda minimizer: {"states": len(minimizer.list_of_groups)}) or minimizer
+    stage('matcher', lambda: DFAMatcher.from_automata(minimizer.reconstruct_dfa()),
+          lambda matcher: {"states": matcher.num_states, "classes": matcher.num_classes})
+    return rows
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(preset: str = 'quick', generators: list[str] = None, repeat: int = 3, workers: int = 2,
+        batch_size: int = 16) -> dict:
+    results = []
+    for name, sizes in SIZES[preset].items():
+        if generators and name not in generators:
+            continue
+        for size in sizes:
+            pattern = GENERATORS[name](size)
+            for row in bench_pattern(pattern, repeat, workers, batch_size, SKIPPED_STAGES.get(preset, set())):
+                results.append({"generator": name, "size": size, "patternLength": len(pattern), **row})
+                print(f'{name:>16} {size:>5} {row["stage"]:>23} {row["seconds"] * 1000:10.2f} ms '
+                      f'{row["peakBytes"] / 1024:10.1f} KiB {row.get("states", "")}')
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "preset": preset,
+        "workers": workers,
+        "batchSize": batch_size,
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[str]:
+    """
+    Lists the stages whose state count changed or that got slower than threshold times the baseline
+    """
+    old = {(r["generator"], r["size"], r["stage"]): r for r in baseline["results"]}
+    ret = []
+    for r in current["results"]:
+        key = (r["generator"], r["size"], r["stage"])
+        if key not in old:
+            continue
+        b = old[key]
+        if b.get("states") != r.get("states"):
+            ret.append(f'{key}: states {b.get("states")} -> {r.get("states")}')
+        if r["seconds"] > b["seconds"] * threshold:
+            ret.append(f'{key}: {b["seconds"] * 1000:.2f} ms -> {r["seconds"] * 1000:.2f} ms')
+    return ret
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Times and memory profiles every compile stage')
+    arg_parser.add_argument('--preset', choices=list(SIZES.keys()), default='quick')
+    arg_parser.add_argument('--generator', action='append', choices=list(GENERATORS.keys()))
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    arg_parser.add_argument('--workers', type=int, default=2, help='processes of the parallel subset construction')
+    arg_parser.add_argument('--batch-size', type=int, default=16, help='groups sent to a worker at a time')
+    arg_parser.add_argument('--output', default='benchmark_results.json')
+    arg_parser.add_argument('--baseline', help='results of an older run to compare with')
+    arg_parser.add_argument('--threshold', type=float, default=1.25, help='slowdown ratio reported as a regression')
+    args = arg_parser.parse_args()
+
+    data = run(args.preset, args.generator, args.repeat, args.workers, args.batch_size)
+    with open(args.output, 'w') as f:
+        json.dump(data, f, indent=4)
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            regressions = compare(json.load(f), data, args.threshold)
+        for line in regressions:
+            print(line)
+        if regressions:
+            raise SystemExit(1)
@@ -0,0 +1,72 @@
+import sys
+import time
+from typing import Optional
+
+# rough bytes held per DFA state and per transition while determinizing (dict entries, lists, small ints)
+STATE_BYTES = 400
+TRANSITION_BYTES = 150
+
+
+class BudgetExceeded(Exception):
+    def __init__(self, resource: str, limit, value):
+        super().__init__(f"Compile budget exceeded: {resource} {value} > {limit}")
+        self.resource = resource
+        self.limit = limit
+        self.value = value
+
+
+class CompileBudget:
+    """
+    Limits on the subset construction, any limit left as None is not checked
+    max_memory is compared to an estimate of the bytes held by the DFA being built, not the process size
+    deadline is in seconds from `start`, which compile calls before parsing
+    """
+
+    def __init__(self, max_states: Optional[int] = None, max_transitions: Optional[int] = None,
+                 max_memory: Optional[int] = None, deadline: Optional[float] = None):
+        self.max_states = max_states
+        self.max_transitions = max_transitions
+        self.max_memory = max_memory
+        self.deadline = deadline
+        self.expires_at: Optional[float] = None
+
+    def start(self):
+        if self.deadline is not None:
+            self.expires_at = time.monotonic() + self.deadline
+
+    @staticmethod
+    def estimate_memory(num_states: int, num_transitions: int, subset_bytes: int) -> int:
+        return num_states * STATE_BYTES + num_transitions * TRANSITION_BYTES + subset_bytes
+
+    @staticmethod
+    def subset_bytes(subset) -> int:
+        return sys.getsizeof(subset)
+
+    def check(self, num_states: int, num_transitions: int, memory: int):
+        """
+        Raises `BudgetExceeded` if the DFA built so far is over a limit or the deadline passed
+        """
+        if self.max_states is not None and num_states > self.max_states:
+            raise BudgetExceeded('states', self.max_states, num_states)
+        if self.max_transitions is not None and num_transitions > self.max_transitions:
+            raise BudgetExceeded('transitions', self.max_transitions, num_transitions)
+        if self.max_memory is not None and memory > self.max_memory:
+            raise BudgetExceeded('memory', self.max_memory, memory)
+        if self.deadline is not None:
+            if self.expires_at is None:
+                self.start()
+            if time.monotonic() > self.expires_at:
+                raise BudgetExceeded('seconds', self.deadline, round(time.monotonic() - self.expires_at + self.deadline, 3))
+
+    def check_dfa(self, num_states: int, num_transitions: int, subset_bytes: int, counts: dict[str, int]):
+        """
+        `check` for a subset construction whose subsets take subset_bytes so far
+        before raising, the states and transitions built so far are put in counts (the ones of its stage)
+        so the stats show how far the construction got before it was aborted
+        """
+        try:
+            self.check(num_states, num_transitions,
+                       CompileBudget.estimate_memory(num_states, num_transitions, subset_bytes))
+        except BudgetExceeded:
+            counts.update(states=num_states, transitions=num_transitions)
+            raise
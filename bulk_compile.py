@@ -0,0 +1,182 @@
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional
+import automaton_format
+from compiler import compile
+from matcher import DFAMatcher
+
+
+class CompileTimeout(Exception):
+    pass
+
+
+class CompileResult:
+    """
+    The outcome of one pattern of a bulk compile
+    data holds the matcher in the binary format of `automaton_format`, it is None if the compile failed
+    and error says why
+    """
+
+    def __init__(self, index: int, pattern: str, data: Optional[bytes], error: Optional[str], seconds: float):
+        self.index = index
+        self.pattern = pattern
+        self.data = data
+        self.error = error
+        self.seconds = seconds
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def get_matcher(self) -> DFAMatcher:
+        if self.data is None:
+            raise Exception(f"Pattern {self.index} failed to compile: {self.error}")
+        return automaton_format.from_buffer(self.data, verify=False)
+
+    def __repr__(self) -> str:
+        status = f'{len(self.data)} bytes' if self.ok else self.error
+        return f'CompileResult({self.index}, {self.pattern!r}, {status})'
+
+
+def compile_matcher(pattern: str, engine: str) -> DFAMatcher:
+    return compile(pattern, engine).matcher
+
+
+def raise_timeout(signum, frame):
+    raise CompileTimeout("compile timed out")
+
+
+def compile_one(pattern: str, engine: str, timeout: Optional[float],
+                compiler: Callable[[str, str], DFAMatcher] = compile_matcher) -> tuple[Optional[bytes], Optional[str], float]:
+    """
+    Compiles a pattern and returns (data, error, seconds), nothing raised by the compile escapes
+    the timeout uses SIGALRM, so it is only enforced on platforms with signal.setitimer and in the main thread
+    """
+    use_timer = (timeout is not None and hasattr(signal, 'setitimer')
+                 and threading.current_thread() is threading.main_thread())
+    start = time.perf_counter()
+    if use_timer:
+        previous = signal.signal(signal.SIGALRM, raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        try:
+            data = automaton_format.to_bytes(compiler(pattern, engine))
+            error = None
+        finally:
+            # disarmed before the handlers below run, an alarm until then is still caught by them
+            if use_timer:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+    except CompileTimeout:
+        data, error = None, f'timed out after {timeout}s'
+    except Exception as e:
+        data, error = None, f'{type(e).__name__}: {e}'
+    finally:
+        if use_timer:
+            signal.signal(signal.SIGALRM, previous)
+    return data, error, time.perf_counter() - start
+
+
+def compile_batch(batch: list[tuple[int, str]], engine: str, timeout: Optional[float],
+                  compiler: Callable[[str, str], DFAMatcher] = compile_matcher) -> list[tuple]:
+    """
+    Runs in a worker process, returns (index, data, error, seconds) for every (index, pattern) of batch
+    """
+    return [(index, *compile_one(pattern, engine, timeout, compiler)) for index, pattern in batch]
+
+
+def bulk_compile(patterns: list[str], workers: Optional[int] = None, timeout: Optional[float] = None,
+                 engine: str = 'hopcroft', batch_size: int = 16,
+                 progress: Callable[[int, int, CompileResult], None] = None,
+                 max_retries: int = 2, compiler: Callable[[str, str], DFAMatcher] = compile_matcher,
+                 mp_context: Optional[str] = None) -> list[CompileResult]:
+    """
+    Compiles many patterns on a pool of worker processes, the results are in the order of patterns
+    a pattern that is invalid, raises or runs past timeout seconds only fails its own `CompileResult`,
+    a batch whose results can't be sent back fails its own patterns
+    patterns are sent in batches of batch_size to keep the inter-process traffic low, 2 batches per worker at most
+    progress(done, total, result) is called for every result as it arrives
+    if a worker process dies the batches in flight are lost, the pool is restarted and they are split in halves
+    that run in parallel again, a single pattern lost this way runs alone at the end and fails if it kills
+    its worker alone more than max_retries times
+    workers=0 compiles in the calling process
+    compiler(pattern, engine) returns the matcher of a pattern, it is sent to the workers so it must be
+    a module level function, mp_context is the start method of the workers ('fork', 'spawn'...)
+    """
+    total = len(patterns)
+    results: list[Optional[CompileResult]] = [None] * total
+    done = 0
+
+    def collect(rows: list[tuple]):
+        nonlocal done
+        for index, data, error, seconds in rows:
+            results[index] = CompileResult(index, patterns[index], data, error, seconds)
+            done += 1
+            if progress is not None:
+                progress(done, total, results[index])
+
+    if workers == 0:
+        collect(compile_batch(list(enumerate(patterns)), engine, timeout, compiler))
+        return results
+
+    workers = workers or os.cpu_count() or 1
+    context = multiprocessing.get_context(mp_context)
+    pending = deque([list(range(first, min(first + batch_size, total))) for first in range(0, total, batch_size)])
+    # patterns lost with a dead worker while running alongside others, they run alone
+    # once the other work is done so a crash points at one pattern
+    suspects = deque()
+    attempts = [0] * total
+    while pending or suspects:
+        # future -> (the indices of its batch, True for a suspect)
+        in_flight: dict = {}
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                while pending or suspects or in_flight:
+                    if pending:
+                        while pending and len(in_flight) < 2 * workers:
+                            # only popped once submitted, submit raises BrokenProcessPool if the pool already broke
+                            batch = pending[0]
+                            future = pool.submit(compile_batch, [(index, patterns[index]) for index in batch],
+                                                 engine, timeout, compiler)
+                            pending.popleft()
+                            in_flight[future] = (batch, False)
+                    elif suspects and not in_flight:
+                        index = suspects[0]
+                        future = pool.submit(compile_batch, [(index, patterns[index])], engine, timeout, compiler)
+                        suspects.popleft()
+                        in_flight[future] = ([index], True)
+                    finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        try:
+                            rows = future.result()
+                        except BrokenProcessPool:
+                            raise
+                        except Exception as e:
+                            # the batch can't come back (a result that doesn't pickle...), only its patterns fail
+                            error = f'{type(e).__name__}: {e}'
+                            rows = [(index, None, error, 0.0) for index in in_flight[future][0]]
+                        collect(rows)
+                        del in_flight[future]
+        except BrokenProcessPool:
+            for batch, suspect in in_flight.values():
+                if len(batch) > 1:
+                    # bisect, the half without the culprit goes through and the other one is split again
+                    middle = len(batch) // 2
+                    pending.appendleft(batch[middle:])
+                    pending.appendleft(batch[:middle])
+                    continue
+                index = batch[0]
+                if not suspect:
+                    suspects.append(index)
+                    continue
+                attempts[index] += 1
+                if attempts[index] > max_retries:
+                    collect([(index, None, 'worker process died', 0.0)])
+                else:
+                    suspects.appendleft(index)
+    return results
@@ -0,0 +1,282 @@
+from functools import lru_cache
+from typing import Optional
+from alphabet import Alphabet
+from matcher import DFAMatcher, DEAD
+
+# self loop runs longer than this are skipped with str methods
+SHORT_RUN = 8
+# the first window scanned by str methods, it doubles while the run goes on
+RUN_WINDOW = 64
+
+
+def char_runs(chars) -> list[tuple[str, str]]:
+    """
+    Splits a set of characters into runs of consecutive code points, {a, b, c, x} -> [(a, c), (x, x)]
+    """
+    codes = sorted(ord(ch) for ch in chars)
+    runs = []
+    for code in codes:
+        if runs and ord(runs[-1][1]) == code - 1:
+            runs[-1] = (runs[-1][0], chr(code))
+        else:
+            runs.append((chr(code), chr(code)))
+    return runs
+
+
+class SourceWriter:
+    """
+    Collects the lines of the generated source and the constants they refer to
+    """
+
+    def __init__(self):
+        self.lines: list[str] = []
+        self.constants: list[str] = []
+
+    def line(self, depth: int, text: str):
+        self.lines.append('    ' * depth + text)
+
+    def constant(self, value: str) -> str:
+        self.constants.append(f'C{len(self.constants)} = {value}')
+        return f'C{len(self.constants) - 1}'
+
+    def condition(self, chars) -> str:
+        """
+        A python expression testing if ch is in chars
+        """
+        runs = char_runs(chars)
+        if len(runs) > 4:
+            return f'ch in {self.constant(f"frozenset({sorted(chars)!r})")}'
+        tests = []
+        for first, last in runs:
+            if first == last:
+                tests.append(f'ch == {first!r}')
+            elif ord(last) - ord(first) == 1:
+                tests.append(f'ch in {first + last!r}')
+            else:
+                tests.append(f'{first!r} <= ch <= {last!r}')
+        return ' or '.join(tests)
+
+    def source(self) -> str:
+        return '\n'.join(self.constants + [''] + self.lines) + '\n'
+
+
+def state_targets(matcher: DFAMatcher, s: int) -> dict[int, list[int]]:
+    """
+    target -> the symbol classes going from s to it
+    """
+    k = matcher.num_classes
+    targets: dict[int, list[int]] = {}
+    for c in range(k):
+        t = matcher.table[s * k + c]
+        if t != DEAD:
+            targets.setdefault(t, []).append(c)
+    return targets
+
+
+def has_run(matcher: DFAMatcher, s: int) -> bool:
+    """
+    True if s loops on itself with the other class or with several characters, a loop on a single
+    character is cheaper as a plain transition
+    """
+    classes = state_targets(matcher, s).get(s, [])
+    return Alphabet.OTHER in classes or sum(len(matcher.alphabet.classes[c]) for c in classes) > 1
+
+
+def write_run(writer: SourceWriter, explicit, chars: set[str], other: bool, depth: int):
+    """
+    Moves i past the run of characters in chars (and the other class if other) with str methods
+    the window scanned doubles until the run ends
+    """
+    writer.line(depth, f'step = {RUN_WINDOW}')
+    writer.line(depth, 'while True:')
+    if other:
+        # the run stops at the first character outside of it, found with str.find
+        writer.line(depth + 1, 'limit = min(i + step, n)')
+        writer.line(depth + 1, 'j = limit')
+        for ch in sorted(explicit - chars):
+            writer.line(depth + 1, f'k = text.find({ch!r}, i, j)')
+            writer.line(depth + 1, 'if k != -1:')
+            writer.line(depth + 2, 'j = k')
+        writer.line(depth + 1, 'i = j')
+        writer.line(depth + 1, 'if j < limit or j == n:')
+        writer.line(depth + 2, 'break')
+    else:
+        # the run is the prefix str.lstrip removes
+        writer.line(depth + 1, 'chunk = text[i:i + step]')
+        writer.line(depth + 1, f'rest = chunk.lstrip({"".join(sorted(chars))!r})')
+        writer.line(depth + 1, 'i += len(chunk) - len(rest)')
+        writer.line(depth + 1, 'if rest or i >= n:')
+        writer.line(depth + 2, 'break')
+    writer.line(depth + 1, 'step *= 2')
+
+
+def write_state(writer: SourceWriter, matcher: DFAMatcher, s: int, depth: int, longest: bool):
+    """
+    The code run for the character ch = text[i] in state s
+    a run of self loops is consumed first, then ch is dispatched to the other targets
+    """
+    alphabet = matcher.alphabet
+    explicit = alphabet.char_class.keys()
+    targets = state_targets(matcher, s)
+    dead = 'return last_end' if longest else 'return False'
+
+    if has_run(matcher, s):
+        classes = targets.pop(s)
+        chars = set()
+        for c in classes:
+            chars.update(alphabet.classes[c])
+        if Alphabet.OTHER in classes:
+            loop = f'not ({writer.condition(explicit - chars)})' if explicit - chars else 'True'
+        else:
+            loop = writer.condition(chars)
+        # short runs are consumed one character at a time, after SHORT_RUN characters
+        # the rest of the run is skipped with str methods
+        writer.line(depth, f'if {loop}:')
+        writer.line(depth + 1, 'i += 1')
+        writer.line(depth + 1, f'stop = i + {SHORT_RUN}')
+        writer.line(depth + 1, 'while i < n:')
+        writer.line(depth + 2, 'ch = text[i]')
+        writer.line(depth + 2, f'if not ({loop}):')
+        writer.line(depth + 3, 'break')
+        writer.line(depth + 2, 'i += 1')
+        writer.line(depth + 2, 'if i >= stop:')
+        write_run(writer, explicit, chars, Alphabet.OTHER in classes, depth + 3)
+        writer.line(depth + 3, 'break')
+        if longest and matcher.accepting[s]:
+            writer.line(depth + 1, 'last_end = i')
+        writer.line(depth + 1, 'if i >= n:')
+        writer.line(depth + 2, 'break')
+        writer.line(depth + 1, 'ch = text[i]')
+
+    # the target reached by the other class goes last, in the else branch
+    branches = sorted(targets.items(), key=lambda item: Alphabet.OTHER in item[1])
+    keyword = 'if'
+    # True once a branch takes every character left
+    complete = False
+    for t, classes in branches:
+        if Alphabet.OTHER in classes:
+            covered = set()
+            for c in classes:
+                covered.update(alphabet.classes[c])
+            excluded = explicit - covered
+            if not excluded:
+                writer.line(depth, 'else:' if keyword == 'elif' else 'if True:')
+                complete = True
+            else:
+                writer.line(depth, f'{keyword} not ({writer.condition(excluded)}):')
+        else:
+            chars = set()
+            for c in classes:
+                chars.update(alphabet.classes[c])
+            writer.line(depth, f'{keyword} {writer.condition(chars)}:')
+        writer.line(depth + 1, f'state = {t}')
+        if longest and matcher.accepting[t]:
+            writer.line(depth + 1, 'last_end = i + 1')
+        keyword = 'elif'
+    if complete:
+        return
+    if keyword == 'elif':
+        writer.line(depth, 'else:')
+        writer.line(depth + 1, dead)
+    else:
+        writer.line(depth, dead)
+
+
+def write_dispatch(writer: SourceWriter, matcher: DFAMatcher, states: list[int], depth: int, longest: bool):
+    """
+    Branches on the state with a binary search so a character costs log(states) comparisons
+    """
+    if len(states) == 1:
+        write_state(writer, matcher, states[0], depth, longest)
+        return
+    middle = len(states) // 2
+    writer.line(depth, f'if state < {states[middle]}:')
+    write_dispatch(writer, matcher, states[:middle], depth + 1, longest)
+    writer.line(depth, 'else:')
+    write_dispatch(writer, matcher, states[middle:], depth + 1, longest)
+
+
+def generate_source(matcher: DFAMatcher) -> str:
+    """
+    Python source of fullmatch(text) and match(text, pos=0) specialized for the matcher's DFA
+    they behave like `DFAMatcher.fullmatch` and `DFAMatcher.match`
+    """
+    writer = SourceWriter()
+    states = list(range(matcher.num_states))
+    accepting = sorted(s for s in states if matcher.accepting[s])
+    # self loop runs move i forward, without them a for loop is cheaper
+    runs = any(has_run(matcher, s) for s in states)
+
+    writer.line(0, 'def fullmatch(text):')
+    writer.line(1, f'state = {matcher.start}')
+    if runs:
+        writer.line(1, 'n = len(text)')
+        writer.line(1, 'i = 0')
+        writer.line(1, 'while i < n:')
+        writer.line(2, 'ch = text[i]')
+    else:
+        writer.line(1, 'for ch in text:')
+    write_dispatch(writer, matcher, states, 2, False)
+    if runs:
+        writer.line(2, 'i += 1')
+    writer.line(1, f'return state in {writer.constant(f"frozenset({accepting!r})")}')
+    writer.line(0, '')
+    writer.line(0, '')
+    writer.line(0, 'def match(text, pos=0):')
+    writer.line(1, 'n = len(text)')
+    writer.line(1, f'state = {matcher.start}')
+    writer.line(1, f'last_end = {"pos" if matcher.accepting[matcher.start] else "None"}')
+    if runs:
+        writer.line(1, 'i = pos')
+        writer.line(1, 'while i < n:')
+    else:
+        writer.line(1, 'for i in range(pos, n):')
+    writer.line(2, 'ch = text[i]')
+    write_dispatch(writer, matcher, states, 2, True)
+    if runs:
+        writer.line(2, 'i += 1')
+    writer.line(1, 'return last_end')
+    return writer.source()
+
+
+@lru_cache(maxsize=256)
+def load_source(source: str) -> dict:
+    """
+    Compiles generated source once, DFAs with the same source share the functions
+    """
+    namespace = {}
+    exec(compile(source, '<dfa codegen>', 'exec'), namespace)
+    return namespace
+
+
+class GeneratedMatcher:
+    """
+    A `DFAMatcher` turned into python functions with one branch per state instead of a table lookup
+    a state looping on itself consumes the whole run with str.lstrip or str.find and
+    the functions return as soon as the DFA dies
+    the speedup only comes from those runs, without them the branches of `write_dispatch` cost
+    log(states) comparisons per character against one index into the table, so a DFA where no state
+    has a run keeps the table functions of its `DFAMatcher` and source is None
+    the source grows with the number of states, so it is meant for small and medium DFAs
+    """
+
+    def __init__(self, matcher: DFAMatcher, max_states: int = 2000):
+        if matcher.num_states > max_states:
+            raise Exception(f"DFA has {matcher.num_states} states, more than {max_states} to generate code for")
+        self.matcher = matcher
+        if not any(has_run(matcher, s) for s in range(matcher.num_states)):
+            self.source = None
+            self.fullmatch = matcher.fullmatch
+            self.match = matcher.match
+            return
+        self.source = generate_source(matcher)
+        namespace = load_source(self.source)
+        self.fullmatch = namespace['fullmatch']
+        self.match = namespace['match']
+
+    def search(self, text: str, pos: int = 0) -> Optional[tuple[int, int]]:
+        """
+        Returns the (start, end) of the leftmost longest match at or after pos, or None if there is no match
+        the one pass search of the table runs faster than an anchored generated match at every position
+        """
+        return self.matcher.search(text, pos)
@@ -0,0 +1,371 @@
+from array import array
+from typing import Optional
+from alphabet import Alphabet
+
+EPS = 'eps'
+# json key of the rule accepted by a state when several patterns are merged
+TAG = 'tag'
+NO_TAG = -1
+
+
+class CompactNFA:
+    """
+    An NFA where states are the integers 0..num_states-1 and the edges are kept in flat arrays (CSR)
+    the symbol edges of state s are targets[offsets[s]:offsets[s+1]] labeled with symbol_ids[offsets[s]:offsets[s+1]]
+    the epsilon edges of state s are eps_targets[eps_offsets[s]:eps_offsets[s+1]]
+    """
+
+    def __init__(self, num_states: int, start: int, accepting: bytearray, symbols: list[str],
+                 offsets: array, targets: array, symbol_ids: array, eps_offsets: array, eps_targets: array,
+                 names: list[str] = None, tags: array = None):
+        self.num_states = num_states
+        self.start = start
+        # accepting[s] is 1 if s is a terminating state
+        self.accepting = accepting
+        # symbol id -> label like 'a', '.' or '[a-c]'
+        self.symbols = symbols
+        self.offsets = offsets
+        self.targets = targets
+        self.symbol_ids = symbol_ids
+        self.eps_offsets = eps_offsets
+        self.eps_targets = eps_targets
+        # the original state names if the NFA was converted from an `AutomataMachine`
+        self.names = names
+        # tags[s] is the rule accepted by s (or NO_TAG), only set for merged patterns
+        self.tags = tags
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.targets)
+
+    @property
+    def num_eps_edges(self) -> int:
+        return len(self.eps_targets)
+
+    def edges(self, state: int):
+        """
+        Yields the (symbol_id, target) pairs of the symbol edges of a state
+        """
+        for i in range(self.offsets[state], self.offsets[state + 1]):
+            yield self.symbol_ids[i], self.targets[i]
+
+    def eps_edges(self, state: int) -> array:
+        return self.eps_targets[self.eps_offsets[state]:self.eps_offsets[state + 1]]
+
+    def state_name(self, state: int) -> str:
+        if self.names is not None:
+            return self.names[state]
+        return f'S{state}'
+
+    def to_json(self) -> dict:
+        """
+        Returns the same dict format produced by `RegParser.parse`
+        """
+        ret = {
+            "startingState": self.state_name(self.start),
+        }
+        for s in range(self.num_states):
+            transitions_dict = {}
+            for symbol_id, t in self.edges(s):
+                transitions_dict.setdefault(self.symbols[symbol_id], []).append(self.state_name(t))
+            for t in self.eps_edges(s):
+                transitions_dict.setdefault(EPS, []).append(self.state_name(t))
+            ret[self.state_name(s)] = {
+                "isTerminatingState": bool(self.accepting[s]),
+                **{k: v[0] if len(v) == 1 else v for k, v in transitions_dict.items()}
+            }
+            if self.tags is not None and self.tags[s] != NO_TAG:
+                ret[self.state_name(s)][TAG] = self.tags[s]
+        return ret
+
+    def partition_alphabet(self) -> "CompactNFA":
+        """
+        Returns the same NFA where every edge label is replaced by the disjoint symbol classes it covers
+        so 'a', '.' and '[a-c]' become edges on 'a', '[bc]' and '[^a-c]' and no two labels overlap
+        the epsilon edges and the state numbers are kept
+        """
+        alphabet = Alphabet(self.symbols)
+        builder = CompactNFABuilder()
+        builder.num_states = self.num_states
+        for c in range(alphabet.num_classes):
+            builder.symbol_id(alphabet.class_labels[c])
+        for s in range(self.num_states):
+            for symbol_id, t in self.edges(s):
+                for c in alphabet.label_classes[self.symbols[symbol_id]]:
+                    builder.add_edge(s, alphabet.class_labels[c], t)
+            for t in self.eps_edges(s):
+                builder.add_eps(s, t)
+        nfa = builder.build(self.start, [s for s in range(self.num_states) if self.accepting[s]])
+        nfa.names = self.names
+        nfa.tags = self.tags
+        return nfa
+
+    @staticmethod
+    def union(nfas: list["CompactNFA"]) -> "CompactNFA":
+        """
+        Merges several NFAs into one with a new start state that has an epsilon edge to each of their starts
+        the terminating states of nfas[i] are tagged with rule i
+        """
+        builder = CompactNFABuilder()
+        start = builder.add_state()
+        accepting = []
+        tags = array('i', [NO_TAG])
+        for rule, nfa in enumerate(nfas):
+            first = builder.num_states
+            builder.num_states += nfa.num_states
+            builder.add_eps(start, first + nfa.start)
+            for s in range(nfa.num_states):
+                for symbol_id, t in nfa.edges(s):
+                    builder.add_edge(first + s, nfa.symbols[symbol_id], first + t)
+                for t in nfa.eps_edges(s):
+                    builder.add_eps(first + s, first + t)
+                if nfa.accepting[s]:
+                    accepting.append(first + s)
+                    tags.append(rule)
+                else:
+                    tags.append(NO_TAG)
+        merged = builder.build(start, accepting)
+        merged.tags = tags
+        return merged
+
+    @staticmethod
+    def from_automata(machine) -> "CompactNFA":
+        """
+        Builds a compact NFA out of an `AutomataMachine` whose states have string names
+        """
+        builder = CompactNFABuilder()
+        ids = {}
+        for name in machine.states.keys():
+            ids[name] = builder.add_state()
+        accepting = []
+        tags = array('i', [NO_TAG]) * len(ids)
+        for name, state in machine.states.items():
+            if state.is_terminating_state:
+                accepting.append(ids[name])
+            tags[ids[name]] = getattr(state, 'tag', NO_TAG)
+            for k, v in state.transitions.items():
+                for dest in v:
+                    if k == EPS:
+                        builder.add_eps(ids[name], ids[dest])
+                    else:
+                        builder.add_edge(ids[name], k, ids[dest])
+        nfa = builder.build(ids[machine.starting_state], accepting)
+        nfa.names = list(ids.keys())
+        if any(tag != NO_TAG for tag in tags):
+            nfa.tags = tags
+        return nfa
+
+
+class EpsilonClosures:
+    """
+    The epsilon closure of the states of a `CompactNFA` that need one, computed once
+    closures are sorted tuples of states, a bitset would take n bits for every closure of an NFA
+    with n states even when it holds 2 of them, so long patterns would need memory quadratic in their length
+    a closure only keeps the important states, the ones with symbol edges and the accepting ones,
+    the others are only passed through and don't tell two subsets apart
+    only the start and the targets of symbol edges get a closure, closures[s] is None for the other states
+    the epsilon graph is condensed into its strongly connected components first (iterative Tarjan),
+    the states of a component share the same closure which is the union of its important states
+    and the closures of the components it points to, the set of a component pointed to by only one
+    other component is taken over by that one instead of copied, so chains like nested alternations
+    don't copy a growing set at every level
+    an NFA without epsilon edges (like the glushkov one) skips all of that
+    """
+
+    def __init__(self, nfa: CompactNFA):
+        n = nfa.num_states
+        offsets, eps_offsets, eps_targets = nfa.offsets, nfa.eps_offsets, nfa.eps_targets
+        important = [offsets[s] != offsets[s + 1] or nfa.accepting[s] for s in range(n)]
+        needed = bytearray(n)
+        needed[nfa.start] = 1
+        for t in nfa.targets:
+            needed[t] = 1
+        self.closures: list[Optional[tuple[int, ...]]] = [None] * n
+        # closure_accepting[s] is 1 if the closure of s has an accepting state,
+        # closure_tags[s] is the smallest tag in it (or NO_TAG), so subsets never have to scan their states
+        self.closure_accepting = bytearray(n)
+        self.closure_tags = array('i', [NO_TAG]) * n
+        if nfa.num_eps_edges == 0:
+            self.num_components = n
+            for s in range(n):
+                if needed[s]:
+                    self.set_closure(nfa, [s], (s,) if important[s] else ())
+            return
+
+        component = [-1] * n
+        # the states of every component, a component only points to components listed before it
+        components: list[list[int]] = []
+
+        index = [-1] * n
+        low = [0] * n
+        on_stack = bytearray(n)
+        stack: list[int] = []
+        counter = 0
+        for root in range(n):
+            if index[root] != -1:
+                continue
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = 1
+            # (state, position of the next epsilon edge to explore)
+            work = [(root, eps_offsets[root])]
+            while work:
+                v, i = work[-1]
+                if i < eps_offsets[v + 1]:
+                    work[-1] = (v, i + 1)
+                    w = eps_targets[i]
+                    if index[w] == -1:
+                        index[w] = low[w] = counter
+                        counter += 1
+                        stack.append(w)
+                        on_stack[w] = 1
+                        work.append((w, eps_offsets[w]))
+                    elif on_stack[w] and index[w] < low[v]:
+                        low[v] = index[w]
+                    continue
+
+                work.pop()
+                if work and low[v] < low[work[-1][0]]:
+                    low[work[-1][0]] = low[v]
+                if low[v] != index[v]:
+                    continue
+
+                # v is the root of a component, components it points to are already done
+                c = len(components)
+                members = []
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = 0
+                    component[w] = c
+                    members.append(w)
+                    if w == v:
+                        break
+                components.append(members)
+
+        self.num_components = len(components)
+        successors: list[set[int]] = []
+        # the number of components pointing to each component and not done yet
+        remaining = [0] * self.num_components
+        for c, members in enumerate(components):
+            points_to = {component[eps_targets[j]] for w in members for j in range(eps_offsets[w], eps_offsets[w + 1])}
+            points_to.discard(c)
+            successors.append(points_to)
+            for d in points_to:
+                remaining[d] += 1
+
+        sets: list[Optional[set[int]]] = []
+        for c, members in enumerate(components):
+            for d in successors[c]:
+                remaining[d] -= 1
+            # the biggest set no other component needs any more is updated in place
+            donor = max((d for d in successors[c] if remaining[d] == 0), key=lambda d: len(sets[d]), default=None)
+            closure = sets[donor] if donor is not None else set()
+            for d in successors[c]:
+                if d != donor:
+                    closure.update(sets[d])
+                if remaining[d] == 0:
+                    sets[d] = None
+            closure.update(w for w in members if important[w])
+            sets.append(closure)
+            needed_members = [w for w in members if needed[w]]
+            if needed_members:
+                self.set_closure(nfa, needed_members, tuple(sorted(closure)))
+
+    def set_closure(self, nfa: CompactNFA, states: list[int], closure: tuple[int, ...]):
+        """
+        Gives the same closure to some states
+        """
+        accepting = any(nfa.accepting[s] for s in closure)
+        tag = NO_TAG
+        if nfa.tags is not None:
+            tag = min((nfa.tags[s] for s in closure if nfa.tags[s] != NO_TAG), default=NO_TAG)
+        for state in states:
+            self.closures[state] = closure
+            self.closure_accepting[state] = accepting
+            self.closure_tags[state] = tag
+
+    @staticmethod
+    def to_bits(states) -> int:
+        """
+        The bitset of some states, bit s is set if state s is in them
+        """
+        bits = 0
+        for s in states:
+            bits |= 1 << s
+        return bits
+
+    @staticmethod
+    def iterate_bits(bits: int):
+        """
+        Yields the indices of the set bits from the lowest
+        """
+        while bits:
+            low = bits & -bits
+            yield low.bit_length() - 1
+            bits ^= low
+
+
+class CompactNFABuilder:
+    """
+    Collects states and edges then packs them into a `CompactNFA`
+    """
+
+    def __init__(self):
+        self.num_states = 0
+        self.symbols: list[str] = []
+        self.symbol2Id: dict[str, int] = {}
+        self.edge_sources = array('i')
+        self.edge_symbols = array('i')
+        self.edge_targets = array('i')
+        self.eps_sources = array('i')
+        self.eps_targets = array('i')
+
+    def add_state(self) -> int:
+        self.num_states += 1
+        return self.num_states - 1
+
+    def symbol_id(self, symbol: str) -> int:
+        if symbol not in self.symbol2Id:
+            self.symbol2Id[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return self.symbol2Id[symbol]
+
+    def add_edge(self, source: int, symbol: str, target: int):
+        self.edge_sources.append(source)
+        self.edge_symbols.append(self.symbol_id(symbol))
+        self.edge_targets.append(target)
+
+    def add_eps(self, source: int, target: int):
+        self.eps_sources.append(source)
+        self.eps_targets.append(target)
+
+    @staticmethod
+    def pack(num_states: int, sources: array, *columns: array) -> tuple[array, ...]:
+        """
+        Counting sort of the edges by source state, returns the offsets followed by the sorted columns
+        """
+        offsets = array('i', [0]) * (num_states + 1)
+        for s in sources:
+            offsets[s + 1] += 1
+        for s in range(num_states):
+            offsets[s + 1] += offsets[s]
+        position = offsets[:-1]
+        sorted_columns = [array('i', [0]) * len(sources) for _ in columns]
+        for i, s in enumerate(sources):
+            p = position[s]
+            position[s] += 1
+            for column, sorted_column in zip(columns, sorted_columns):
+                sorted_column[p] = column[i]
+        return (offsets, *sorted_columns)
+
+    def build(self, start: int, accepting: list[int]) -> CompactNFA:
+        accepting_flags = bytearray(self.num_states)
+        for s in accepting:
+            accepting_flags[s] = 1
+        offsets, symbol_ids, targets = CompactNFABuilder.pack(
+            self.num_states, self.edge_sources, self.edge_symbols, self.edge_targets)
+        eps_offsets, eps_targets = CompactNFABuilder.pack(
+            self.num_states, self.eps_sources, self.eps_targets)
+        return CompactNFA(self.num_states, start, accepting_flags, list(self.symbols),
+                          offsets, targets, symbol_ids, eps_offsets, eps_targets)
@@ -0,0 +1,112 @@
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Iterator, Optional
+
+
+class StageStats:
+    """
+    The wall time, the peak memory (if traced) and the counts like states, edges or passes of one compile stage
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.seconds = 0.0
+        self.peak_bytes: Optional[int] = None
+        self.counts: dict[str, int] = {}
+        # why the stage stopped early, counts['aborted'] is 1 then
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        data = {"stage": self.name, "seconds": self.seconds, "peakBytes": self.peak_bytes, **self.counts}
+        if self.error is not None:
+            data["error"] = self.error
+        return data
+
+    def __repr__(self) -> str:
+        counts = ' '.join(f'{k}={v}' for k, v in self.counts.items())
+        memory = f' peak={self.peak_bytes / 1024:.1f}KiB' if self.peak_bytes is not None else ''
+        error = f' ({self.error})' if self.error is not None else ''
+        return f'{self.name}: {self.seconds * 1000:.2f}ms{memory} {counts}'.rstrip() + error
+
+
+class CompileStats:
+    """
+    Statistics of a compile, `RegParser`, `dfa_generator` and `DFA_Minimizer` fill it when they are given one
+    stages are recorded in the order they run, hook(stats, stage) is called at the end of each of them,
+    a stage left by an exception (a `budget.BudgetExceeded`...) is recorded too, marked as aborted
+    peak memory is only measured with trace_memory because tracemalloc slows everything down
+    """
+
+    def __init__(self, hook: Callable[["CompileStats", StageStats], None] = None, trace_memory: bool = False):
+        self.hook = hook
+        self.trace_memory = trace_memory
+        self.stages: list[StageStats] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageStats]:
+        stage = StageStats(name)
+        started_tracing = False
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield stage
+        except BaseException as e:
+            stage.counts['aborted'] = 1
+            stage.error = f'{type(e).__name__}: {e}'
+            raise
+        finally:
+            stage.seconds = time.perf_counter() - start
+            if self.trace_memory:
+                stage.peak_bytes = tracemalloc.get_traced_memory()[1] - base
+                if started_tracing:
+                    tracemalloc.stop()
+            self.stages.append(stage)
+            if self.hook is not None:
+                self.hook(self, stage)
+
+    @staticmethod
+    def measure(stats: Optional["CompileStats"], name: str):
+        """
+        stats.stage(name), or a stage that is thrown away if stats is None
+        """
+        if stats is None:
+            return nullcontext(StageStats(name))
+        return stats.stage(name)
+
+    def get(self, name: str) -> Optional[StageStats]:
+        """
+        The last stage recorded with this name
+        """
+        for stage in reversed(self.stages):
+            if stage.name == name:
+                return stage
+        return None
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(stage.seconds for stage in self.stages)
+
+    @property
+    def peak_bytes(self) -> Optional[int]:
+        peaks = [stage.peak_bytes for stage in self.stages if stage.peak_bytes is not None]
+        return max(peaks) if peaks else None
+
+    def to_dict(self) -> dict:
+        return {
+            "seconds": self.total_seconds,
+            "peakBytes": self.peak_bytes,
+            "stages": [stage.to_dict() for stage in self.stages],
+        }
+
+    @staticmethod
+    def print_hook(stats: "CompileStats", stage: StageStats):
+        """
+        A hook printing every stage as it ends
+        """
+        print(stage)
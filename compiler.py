@@ -0,0 +1,116 @@
+from typing import Optional, Union
+from budget import BudgetExceeded, CompileBudget
+from codegen import GeneratedMatcher
+from compact_nfa import CompactNFA
+from compile_stats import CompileStats
+from dfa_generator import AutomataMachine, dfa_generator, DFA_Minimizer
+from direct_dfa import DirectDFA
+from lazy_dfa import LazyDFA, NFASimulator
+from matcher import DFAMatcher
+from reg_parser import RegParser
+
+# the values of CompiledPattern.matcher_engine
+DFA_ENGINE = 'dfa'
+NFA_ENGINE = 'nfa'
+LAZY_ENGINE = 'lazy'
+
+
+class CompiledPattern:
+    """
+    The result of `compile`, the automata of every stage are kept for inspection
+    nfa is the `CompactNFA` (None for the 'direct' construction), dfa the minimized `AutomataMachine`
+    and matcher runs its table
+    stats is the `CompileStats` of the compile if one was given
+    if the DFA went over the compile budget, matcher_engine is NFA_ENGINE, matcher is an `NFASimulator`,
+    dfa is None and budget_error says which limit was hit
+    compiled with lazy, matcher_engine is LAZY_ENGINE, matcher is a `LazyDFA` and dfa is None
+    """
+
+    def __init__(self, pattern: str, nfa: Optional[CompactNFA], dfa: Optional[AutomataMachine],
+                 matcher: Union[DFAMatcher, NFASimulator, LazyDFA], stats: CompileStats = None,
+                 budget_error: BudgetExceeded = None):
+        self.pattern = pattern
+        self.nfa = nfa
+        self.dfa = dfa
+        self.matcher = matcher
+        self.stats = stats
+        self.budget_error = budget_error
+        if isinstance(matcher, LazyDFA):
+            self.matcher_engine = LAZY_ENGINE
+        elif isinstance(matcher, NFASimulator):
+            self.matcher_engine = NFA_ENGINE
+        else:
+            self.matcher_engine = DFA_ENGINE
+        # built by get_generated_matcher
+        self.generated: GeneratedMatcher = None
+
+    def fullmatch(self, text: str) -> bool:
+        return self.matcher.fullmatch(text)
+
+    def match(self, text: str, pos: int = 0) -> Optional[int]:
+        return self.matcher.match(text, pos)
+
+    def search(self, text: str, pos: int = 0) -> Optional[tuple[int, int]]:
+        return self.matcher.search(text, pos)
+
+    def get_generated_matcher(self) -> GeneratedMatcher:
+        """
+        The DFA compiled to python functions (see `codegen`), faster than the table on DFAs with self loop runs
+        """
+        if self.matcher_engine != DFA_ENGINE:
+            raise Exception(f"No DFA to generate code for, the matcher engine is {self.matcher_engine}")
+        if self.generated is None:
+            self.generated = GeneratedMatcher(self.matcher)
+        return self.generated
+
+    def __repr__(self) -> str:
+        if self.matcher_engine != DFA_ENGINE:
+            return f'CompiledPattern({self.pattern!r}, engine={self.matcher_engine})'
+        return f'CompiledPattern({self.pattern!r}, states={self.matcher.num_states})'
+
+
+def compile(pattern: str, engine: str = 'hopcroft', stats: CompileStats = None, workers: int = 1,
+            budget: CompileBudget = None, construction: str = 'thompson', lazy: bool = False) -> CompiledPattern:
+    """
+    Parses the pattern, builds the NFA, the DFA and the minimized DFA, all in memory
+    nothing is written to disk or printed, engine is the minimization engine (see `DFA_Minimizer.engines`)
+    every stage is recorded in stats if given, use CompileStats(hook=CompileStats.print_hook) to print them
+    workers > 1 runs the subset construction on that many processes (see `dfa_generator.convert_to_dfa`)
+    if the subset construction goes over budget it stops and the pattern is matched by simulating the NFA
+    construction picks how the NFA is built (see `RegParser.constructions`), 'glushkov' has no epsilon edges
+    and 'direct' builds the DFA from the expression without an NFA (see `direct_dfa.DirectDFA`)
+    lazy skips the DFA stages, the NFA is determinized while matching by a `LazyDFA`
+    """
+    if budget is not None:
+        budget.start()
+    parser = RegParser(pattern, stats)
+    if lazy:
+        if construction == 'direct':
+            raise Exception("A lazy DFA needs an NFA, it can't use the direct construction")
+        nfa = parser.parse_compact(construction)
+        with CompileStats.measure(stats, 'lazy_matcher') as stage:
+            matcher = LazyDFA(nfa)
+            stage.counts.update(states=nfa.num_states, classes=matcher.alphabet.num_classes)
+        return CompiledPattern(pattern, nfa, None, matcher, stats)
+    nfa = None
+    try:
+        if construction == 'direct':
+            dfa = DirectDFA(parser, stats, budget).convert_to_dfa()
+        else:
+            nfa = parser.parse_compact(construction)
+            dfa = dfa_generator(nfa=nfa, stats=stats, budget=budget).convert_to_dfa(workers)
+    except BudgetExceeded as e:
+        if nfa is None:
+            # the simulation needs an NFA, the glushkov one is built from the same positions
+            nfa = parser.parse_compact('glushkov')
+        with CompileStats.measure(stats, 'nfa_matcher') as stage:
+            matcher = NFASimulator(nfa)
+            stage.counts.update(states=nfa.num_states, classes=matcher.alphabet.num_classes)
+        return CompiledPattern(pattern, nfa, None, matcher, stats, e)
+    minimizer = DFA_Minimizer(dfa, engine, stats)
+    minimizer.minimize()
+    minimized_dfa = minimizer.reconstruct_dfa()
+    with CompileStats.measure(stats, 'matcher') as stage:
+        matcher = DFAMatcher.from_automata(minimized_dfa)
+        stage.counts.update(states=matcher.num_states, classes=matcher.num_classes)
+    return CompiledPattern(pattern, nfa, minimized_dfa, matcher, stats)
@@ -1,20 +1,21 @@
 import json
-from typing import Tuple, Union
-from collections import deque
-from matplotlib import pyplot as plt
-import pyvis.network as net
-import networkx as nx
-# graphvis
-# https://graphviz.org/download
-from graphviz import Digraph
-EPS = 'eps'
+import warnings
+from array import array
+from typing import Union
+from concurrent.futures import ProcessPoolExecutor
+from compact_nfa import CompactNFA, EpsilonClosures, TAG, NO_TAG
+from budget import CompileBudget
+from compile_stats import CompileStats
+from matcher import DFAMatcher, DEAD
 
 
 class State:
-    def __init__(self, id: str, is_terminating_state: bool, transitions: dict[str, list[str]]):
+    def __init__(self, id: str, is_terminating_state: bool, transitions: dict[str, list[str]], tag: int = NO_TAG):
         self.id = id
         self.is_terminating_state = is_terminating_state
         self.transitions = transitions
+        # the rule accepted in this state when several patterns are merged, NO_TAG otherwise
+        self.tag = tag
 
     def have_transition(self, input: str) -> bool:
         return input in self.transitions.keys()
@@ -25,20 +26,30 @@ class AutomataMachine:
         self.name = name
         self.starting_state: str = None
         self.states = {}
+        # optional function giving a readable name to a state, used by save_to_json and draw
+        self.state_namer = None
 
     def init_from_file(self, json_file):
         self.states = self.load_json(json_file)
         return self
 
-    def init_from_dict(self, states: dict[str, bool], starting_state: str, transitions: dict[str, dict[str, list[str]]]):
+    def init_from_dict(self, states: dict[str, bool], starting_state: str, transitions: dict[str, dict[str, list[str]]], tags: dict[str, int] = None):
         self.starting_state = starting_state
         for state, is_terminal in states.items():
-            self.add_state(state, is_terminal, transitions[state])
+            self.add_state(state, is_terminal, transitions[state], tags[state] if tags else NO_TAG)
+
+    def init_from_compact(self, nfa: CompactNFA):
+        self.states = self.load_dict(nfa.to_json())
+        return self
 
     def load_json(self, json_file) -> dict[str, State]:
         with open(json_file, 'r') as file:
             data = json.load(file)
         # print(data)
+        return self.load_dict(data)
+
+    def load_dict(self, data: dict) -> dict[str, State]:
+        data = dict(data)
         self.starting_state: str = data['startingState']
         data.pop('startingState')
 
@@ -46,15 +57,22 @@ class AutomataMachine:
         for key, value in data.items():
             # v can be a list of states or a single state
             transitions = {k: [v] if not isinstance(
-                v, list) else v for k, v in value.items() if k != 'isTerminatingState'}
+                v, list) else v for k, v in value.items() if k != 'isTerminatingState' and k != TAG}
 
             states[key] = State(
-                key, value['isTerminatingState'], transitions)
+                key, value['isTerminatingState'], transitions, value.get(TAG, NO_TAG))
         return states
 
     def get_starting_state(self):
         return self.starting_state
 
+    def get_state_name(self, state) -> str:
+        if self.state_namer is not None:
+            return self.state_namer(state)
+        if isinstance(state, str):
+            return state
+        return f'S{state}'
+
     def get_state(self, state):
         return self.states[state]
 
@@ -71,8 +89,8 @@ class AutomataMachine:
         nxt_state = self.states[state].transitions[input]
         return nxt_state
 
-    def add_state(self, state: str, is_terminating_state: bool, transitions: dict[str, list[str]]):
-        self.states[state] = State(state, is_terminating_state, transitions)
+    def add_state(self, state: str, is_terminating_state: bool, transitions: dict[str, list[str]], tag: int = NO_TAG):
+        self.states[state] = State(state, is_terminating_state, transitions, tag)
 
     def add_transition(self, state: str, input: str, next_state: str):
         if state not in self.states.keys():
@@ -100,74 +118,89 @@ class AutomataMachine:
     # }
     def save_to_json(self, file):
         with open(file, 'w') as f:
-            data = {'startingState': self.starting_state}
+            data = {'startingState': self.get_state_name(self.starting_state)}
             for k, v in self.states.items():
-                data[k] = {'isTerminatingState': v.is_terminating_state}
+                name = self.get_state_name(k)
+                data[name] = {'isTerminatingState': v.is_terminating_state}
+                if v.tag != NO_TAG:
+                    data[name][TAG] = v.tag
                 for kk, vv in v.transitions.items():
-                    data[k][kk] = vv[0] if len(vv) == 1 else vv
+                    vv = [self.get_state_name(dest) for dest in vv]
+                    data[name][kk] = vv[0] if len(vv) == 1 else vv
 
-                data[k] = dict(sorted(data[k].items(),))
+                data[name] = dict(sorted(data[name].items(),))
 
             json.dump(data, f, indent=4)
 
+    def save_to_binary(self, file):
+        """
+        Writes a DFA in the binary format of `automaton_format`, much smaller and faster to load than json
+        """
+        DFAMatcher.from_automata(self).save(file)
+
+    def init_from_binary(self, file):
+        """
+        Loads a DFA written by save_to_binary, states are numbered and edges are labeled with symbol classes
+        """
+        matcher = DFAMatcher.load(file)
+        k = matcher.num_classes
+        self.starting_state = matcher.start
+        self.states = {}
+        for s in range(matcher.num_states):
+            transitions = {}
+            for c in range(k):
+                t = matcher.table[s * k + c]
+                if t != DEAD:
+                    transitions[matcher.alphabet.class_labels[c]] = [t]
+            tag = matcher.tags[s] if matcher.tags is not None else NO_TAG
+            self.add_state(s, bool(matcher.accepting[s]), transitions, tag)
+        return self
+
+    def save_to_dot(self, file, **options):
+        """
+        Writes a DFA as graphviz DOT, or svg/png/pdf if options has a format, see `visualization.render`
+        unlike draw it scales to very large automata
+        """
+        from visualization import render
+        options.setdefault('format', 'dot')
+        render(DFAMatcher.from_automata(self), file, **options)
+
     def draw(self):
-        G = nx.MultiDiGraph()
-        for state in self.states.values():
-            # https://stackoverflow.com/questions/74082881/adding-icon-for-node-shape-using-networkx-and-pyvis-python
-            G.add_node(
-                state.id, color='gray' if not state.id == self.starting_state else 'orange', shape='diamond' if state.is_terminating_state else 'circle', size=10, font={'size': 8}
-            )
-
-            # merge common edges like if 2 edges like (s1,s2,"a") and (s1,s2,"b") are present, merge them to (s1,s2,"a,b")
-            merged_edges = {}
-            for k, v in state.transitions.items():
-                for dest_state in v:
-                    edge = (state.id, dest_state, k)
-                    if edge[:2] in merged_edges.keys():
-                        merged_edges[edge[:2]].append(edge[2])
-                    else:
-                        merged_edges[edge[:2]] = [edge[2]]
-
-            # finally add the merged edges to the graph
-            for k, v in merged_edges.items():
-                G.add_edge(k[0], k[1], label=','.join(
-                    v), color='gray' if k[1] != EPS else 'red')
-
-        nt = net.Network(notebook=True, cdn_resources='remote', directed=True)
-        nt.show_buttons(filter_=['physics'])
-        nt.set_edge_smooth('dynamic')
-        nt.from_nx(G)
-        nt.repulsion(spring_strength=0.02)
-        nt.toggle_physics(True)
-        nt.show(f'{self.name}_FSM.html')
-
-        # write dot file to use with graphviz
-        # nx.write_dot(G, f'{self.name}_FSM.dot')
-
-        # draw using nx instead
-        # pos = nx.planar_layout(g)
-        # plt.figure()
-        # nx.draw(g,pos,with_labels=True)
-        # plt.show()
-        # Drawing the graph
-        # First obtain the node positions using one of the layouts
-
-        # pos = nx.circular_layout(G)
-        # fig, ax = plt.subplots()
-        # nx.draw_networkx_nodes(G, pos, ax=ax)
-        # nx.draw_networkx_labels(G, pos, ax=ax)
-        # nx.draw_networkx_edges(G, pos, ax=ax)
-        # nx.draw_networkx_edges(
-        #     G, pos, ax=ax,  connectionstyle=f'arc3, rad = {0.25}')
-
-        # # nx.draw_networkx_edge_labels(G, pos, ax=ax)
-        # fig.savefig(f'{self.name}_FSM.png', bbox_inches='tight', pad_inches=0)
+        """
+        Shows the machine with pyvis, the plotting libraries are only imported here (see `visualization`)
+        """
+        from visualization import draw_machine
+        draw_machine(self)
 
 
 class dfa_generator:
 
-    def __init__(self, json_file):
-        self.nfa_sm = AutomataMachine().init_from_file(json_file)
+    def __init__(self, json_file=None, nfa: CompactNFA = None, stats: CompileStats = None,
+                 budget: CompileBudget = None):
+        """
+        The NFA is either read from a json file or given directly as a `CompactNFA`
+        stats gets the 'partition', 'closures' and 'subset' stages if given
+        convert_to_dfa raises `budget.BudgetExceeded` as soon as the DFA goes over budget
+        """
+        self.stats = stats
+        self.budget = budget
+        if nfa is not None:
+            self.nfa = nfa
+        else:
+            self.nfa = CompactNFA.from_automata(AutomataMachine().init_from_file(json_file))
+        # the NFA with its labels split into disjoint symbol classes, see `CompactNFA.partition_alphabet`
+        self.partitioned_nfa: CompactNFA = None
+        self.closures: EpsilonClosures = None
+        self.groups: list[int] = []
+
+    @property
+    def nfa_sm(self) -> AutomataMachine:
+        """
+        Deprecated, the NFA as an `AutomataMachine` like before it was kept as a `CompactNFA`, use nfa
+        """
+        warnings.warn("dfa_generator.nfa_sm is deprecated, use dfa_generator.nfa (a CompactNFA)",
+                      DeprecationWarning, stacklevel=2)
+        return AutomataMachine().init_from_compact(self.nfa)
 
     def get_states_group_id(self, states: set[str]):
         """
@@ -177,95 +210,210 @@ class dfa_generator:
         l.sort()
         return '_'.join(l)
 
-    def get_closure(self, state: State) -> Tuple[set[str], set[str], bool]:
+    def get_partitioned_nfa(self) -> CompactNFA:
+        if self.partitioned_nfa is None:
+            with CompileStats.measure(self.stats, 'partition') as stage:
+                self.partitioned_nfa = self.nfa.partition_alphabet()
+                stage.counts.update(labels=len(self.nfa.symbols), classes=len(self.partitioned_nfa.symbols),
+                                    edges=self.partitioned_nfa.num_edges)
+        return self.partitioned_nfa
+
+    def get_closures(self) -> EpsilonClosures:
+        if self.closures is None:
+            nfa = self.get_partitioned_nfa()
+            with CompileStats.measure(self.stats, 'closures') as stage:
+                self.closures = EpsilonClosures(nfa)
+                # one closure is computed per strongly connected component, the states share it
+                stage.counts.update(states=nfa.num_states, closures=self.closures.num_components)
+        return self.closures
+
+    def get_subset_id(self, subset: tuple[int, ...]) -> str:
         """
-        Returns the epsilon closure of a state
-        2 sets are returned, one for the states and the other for the combined Transitions
+        The readable id of a group, only built when a name is needed
         """
-        ret_states = set()
-        ret_transitions = set()
-        q = deque()
-        q.append(state)
-        is_terminating = False
-        while q:
-            curr_state = q.popleft()
-            ret_states.add(curr_state.id)
-            is_terminating = is_terminating or curr_state.is_terminating_state
-            # the transitions of the group is the union of all transitions from each state
-            ret_transitions = ret_transitions.union(
-                set(curr_state.transitions.keys()))
-
-            if EPS in curr_state.transitions.keys():
-                for s in curr_state.transitions[EPS]:
-                    if s not in ret_states:
-                        q.append(self.nfa_sm.get_state(s))
-
-        return ret_states, ret_transitions, is_terminating
-
-    def convert_to_dfa(self):
+        return self.get_states_group_id({self.nfa.state_name(s) for s in subset})
+
+    def convert_to_dfa(self, workers: int = 1, batch_size: int = 256, min_frontier: int = 4096):
         """
         Converts an NFA to a DFA
+        a group of NFA states is a sorted tuple, the group reached by a symbol is the union of the
+        precomputed closures of the targets, so no closure is computed twice
+        DFA states are numbered 0, 1, ... in discovery order, `self.groups[i]` is the tuple of state i
+        and the readable names like S0_S3_S4 are only built by save_to_json and draw
+        the inputs of the DFA are the disjoint symbol classes of the NFA labels, so a state
+        never has two transitions that can match the same character
+        if the NFA states are tagged with rules, a DFA state takes the smallest tag of its NFA states
+        with workers > 1 the moves of the BFS levels of at least min_frontier groups are computed by a pool
+        of processes in batches of batch_size groups, the DFA is the same as with one worker, numbering included
         """
-        start_state = self.nfa_sm.get_starting_state()
-        start_closure_states, start_closure_T, is_terminal = self.get_closure(
-            self.nfa_sm.get_state(start_state))
+        nfa = self.get_partitioned_nfa()
+        closures = self.get_closures()
+        with CompileStats.measure(self.stats, 'subset') as stage:
+            new_dfa = self.build_subsets(nfa, closures, stage.counts, workers, batch_size, min_frontier)
+        return new_dfa
 
-        states: dict[str, bool] = {}
+    def build_subsets(self, nfa: CompactNFA, closures: EpsilonClosures, counts: dict[str, int], workers: int = 1,
+                      batch_size: int = 256, min_frontier: int = 4096) -> AutomataMachine:
+        """
+        Breadth first search one level at a time, the groups of a level are expanded in the order of their
+        numbers like a FIFO queue would, so the numbering doesn't depend on who computes the moves
+        a group costs tens of microseconds to expand and about as much to send to a worker and back,
+        so the pool is only started by the first level of min_frontier groups and smaller levels stay
+        in this process, the closures are sent once to every worker by its initializer
+        """
+        start_group = closures.closures[nfa.start]
+        # group -> DFA state number
+        groups_ids = {start_group: 0}
+        self.groups: list[tuple[int, ...]] = [start_group]
+        states: dict[int, bool] = {0: bool(closures.closure_accepting[nfa.start])}
         # {state: {input: [next_states]}}
-        transitions: dict[str, dict[str, list[str]]] = {}
-        q = deque()
-        q.append((start_closure_states, start_closure_T, is_terminal))
-
-        while q:
-            curr_group_states, curr_group_Ts, is_terminal = q.popleft()
-            curr_id = self.get_states_group_id(curr_group_states)
-            states[curr_id] = is_terminal
-            transitions[curr_id] = {}
-            for t in curr_group_Ts:
-                if t == EPS:
-                    continue
-                next_group_states = set()
-                next_group_Ts = set()
-                next_is_terminal = False
-
-                for state in curr_group_states:
-                    s = self.nfa_sm.get_state(state)
-                    if s.have_transition(t):
-                        # reachable from the current group
-                        next_states = s.transitions[t]
-                        for ns in next_states:
-                            se, te, it = self.get_closure(
-                                self.nfa_sm.get_state(ns))
-                            next_group_states = next_group_states.union(se)
-                            next_group_Ts = next_group_Ts.union(te)
-                            next_is_terminal = next_is_terminal or it
-
-                transitions[curr_id][t] = [
-                    self.get_states_group_id(next_group_states)]
-
-                if self.get_states_group_id(next_group_states) not in states.keys():
-                    q.append((next_group_states, next_group_Ts, next_is_terminal))
+        transitions: dict[int, dict[str, list[int]]] = {}
+        tags: dict[int, int] = {0: closures.closure_tags[nfa.start]}
+        # closures merged into the groups reached from a group
+        closure_unions = 0
+        num_transitions = 0
+        subset_bytes = CompileBudget.subset_bytes(start_group)
+
+        pool = None
+        parallel_levels = 0
+        frontier = [start_group]
+        try:
+            while frontier:
+                if workers <= 1 or len(frontier) < min_frontier:
+                    moves = [subset_moves(nfa.offsets, nfa.symbol_ids, nfa.targets, closures.closures,
+                                          closures.closure_accepting, closures.closure_tags, group)
+                             for group in frontier]
+                else:
+                    if pool is None:
+                        pool = ProcessPoolExecutor(max_workers=workers, initializer=init_subset_worker,
+                                                   initargs=(nfa.offsets, nfa.symbol_ids, nfa.targets,
+                                                             closures.closures, closures.closure_accepting,
+                                                             closures.closure_tags))
+                    parallel_levels += 1
+                    batches = [frontier[i:i + batch_size] for i in range(0, len(frontier), batch_size)]
+                    moves = [m for batch_moves in pool.map(expand_subsets, batches) for m in batch_moves]
+
+                next_frontier = []
+                for curr_group, (next_groups, unions) in zip(frontier, moves):
+                    curr_id = groups_ids[curr_group]
+                    transitions[curr_id] = {}
+                    closure_unions += unions
+                    num_transitions += len(next_groups)
+                    for symbol_id, next_group, accepting, tag in next_groups:
+                        if next_group not in groups_ids:
+                            next_id = groups_ids[next_group] = len(self.groups)
+                            self.groups.append(next_group)
+                            states[next_id] = accepting
+                            # the rule listed first wins
+                            tags[next_id] = tag
+                            next_frontier.append(next_group)
+                            subset_bytes += CompileBudget.subset_bytes(next_group)
+                        transitions[curr_id][nfa.symbols[symbol_id]] = [groups_ids[next_group]]
+                    if self.budget is not None:
+                        self.budget.check_dfa(len(self.groups), num_transitions, subset_bytes, counts)
+                frontier = next_frontier
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+            if workers > 1:
+                counts['parallel_levels'] = parallel_levels
 
         new_dfa = AutomataMachine(name='DFA')
-        new_dfa.init_from_dict(states, self.get_states_group_id(
-            start_closure_states), transitions)
+        new_dfa.init_from_dict(states, 0, transitions, tags)
+        groups = self.groups
+        new_dfa.state_namer = lambda state: self.get_subset_id(groups[state])
+        counts.update(states=len(states), transitions=num_transitions, closure_unions=closure_unions)
         return new_dfa
 
 
+def subset_moves(offsets, symbol_ids, targets, closures: list[tuple[int, ...]], closure_accepting: bytearray,
+                 closure_tags: array, group: tuple[int, ...]) -> tuple[list[tuple[int, tuple[int, ...], bool, int]], int]:
+    """
+    The (symbol_id, next group, accepting, tag) of a group in the order the symbols are first seen,
+    and the number of closures merged to get them
+    a next group reached by a single closure is that closure itself, accepting and tag are merged
+    from the ones of the closures so a group is never scanned for them
+    """
+    # symbol_id -> [the closure or the set of the states merged so far, accepting, tag]
+    merged: dict[int, list] = {}
+    unions = 0
+    for s in group:
+        unions += offsets[s + 1] - offsets[s]
+        for i in range(offsets[s], offsets[s + 1]):
+            t = targets[i]
+            closure = closures[t]
+            if not closure:
+                continue
+            entry = merged.get(symbol_ids[i])
+            if entry is None:
+                merged[symbol_ids[i]] = [closure, closure_accepting[t], closure_tags[t]]
+                continue
+            if entry[0] is closure:
+                continue
+            if type(entry[0]) is tuple:
+                entry[0] = set(entry[0])
+            entry[0].update(closure)
+            entry[1] |= closure_accepting[t]
+            if closure_tags[t] != NO_TAG and (entry[2] == NO_TAG or closure_tags[t] < entry[2]):
+                entry[2] = closure_tags[t]
+    return [(symbol_id, states if type(states) is tuple else tuple(sorted(states)), bool(accepting), tag)
+            for symbol_id, (states, accepting, tag) in merged.items()], unions
+
+
+# the NFA arrays of a subset construction worker process, set once by init_subset_worker
+subset_worker_nfa: tuple = None
+
+
+def init_subset_worker(offsets, symbol_ids, targets, closures: list[tuple[int, ...]], closure_accepting: bytearray,
+                       closure_tags: array):
+    global subset_worker_nfa
+    subset_worker_nfa = (offsets, symbol_ids, targets, closures, closure_accepting, closure_tags)
+
+
+def expand_subsets(groups: list[tuple[int, ...]]) -> list[tuple[list[tuple[int, tuple[int, ...], bool, int]], int]]:
+    return [subset_moves(*subset_worker_nfa, group) for group in groups]
+
+
 class DFA_Minimizer:
 
-    def __init__(self, dfa: AutomataMachine):
+    engines = ['moore', 'hopcroft']
+
+    def __init__(self, dfa: AutomataMachine, engine: str = 'moore', stats: CompileStats = None):
+        """
+        engine 'moore' refines all the groups on every pass until nothing changes
+        engine 'hopcroft' only splits the groups affected by a splitter, O(n.|inputs|.log n)
+        stats gets the 'minimize' and 'reconstruct' stages if given
+        """
+        if engine not in DFA_Minimizer.engines:
+            raise Exception(f"Unknown minimization engine {engine}")
         self.dfa = dfa
+        self.engine = engine
+        self.stats = stats
+        # moore passes over all the groups, or splitters processed by hopcroft
+        self.refinement_passes = 0
         # we begin by splitting the states into 2 groups, the terminating states and the non-terminating states
         self.list_of_groups: list[set] = [
             {state for state in dfa.states.keys(
             ) if not dfa.is_terminating_state(state)},
             {state for state in dfa.states.keys() if dfa.is_terminating_state(state)}
         ]
+        # states accepting different rules can't be merged either
+        if any(s.tag != NO_TAG for s in dfa.states.values()):
+            terminating_groups = {}
+            for state in self.list_of_groups[1]:
+                terminating_groups.setdefault(dfa.states[state].tag, set()).add(state)
+            self.list_of_groups = [self.list_of_groups[0]] + list(terminating_groups.values())
+        # state -> index of its group in list_of_groups
+        self.group_index: dict = None
+
+    def index_groups(self):
+        self.group_index = {state: i for i, g in enumerate(self.list_of_groups) for state in g}
 
     def get_group(self, state: str, list_of_groups: list[set] = None) -> int:
         # if not a local list of groups then use the global one
         if not list_of_groups:
+            if self.group_index is not None:
+                return self.group_index.get(state, -1)
             list_of_groups = self.list_of_groups
 
         for i, g in enumerate(list_of_groups):
@@ -275,8 +423,21 @@ class DFA_Minimizer:
         return -1
 
     def minimize(self):
+        with CompileStats.measure(self.stats, 'minimize') as stage:
+            initial_groups = len(self.list_of_groups)
+            if self.engine == 'hopcroft':
+                self.minimize_hopcroft()
+            else:
+                self.minimize_moore()
+            self.index_groups()
+            stage.counts.update(states=len(self.dfa.states), initial_groups=initial_groups,
+                                groups=len(self.list_of_groups), passes=self.refinement_passes)
+
+    def minimize_moore(self):
         # we will keep merging the groups until no more merges can be done
         while True:
+            self.refinement_passes += 1
+            self.index_groups()
             new_groups = []
             for group in self.list_of_groups:
                 # if the group has only 1 element, we can't split it any further
@@ -305,7 +466,73 @@ class DFA_Minimizer:
                 break
             self.list_of_groups = new_groups
 
+    def minimize_hopcroft(self):
+        states = list(self.dfa.states.keys())
+        ids = {state: i for i, state in enumerate(states)}
+        inputs = sorted({k for s in self.dfa.states.values() for k in s.transitions.keys()})
+        # missing transitions go to an extra dead state that loops on itself
+        dead = len(states)
+
+        # inverse[a][t] is the list of states going to t with input a
+        inverse: list[dict[int, list[int]]] = [{} for _ in inputs]
+        for a, k in enumerate(inputs):
+            for s, state in enumerate(states):
+                transitions = self.dfa.states[state].transitions
+                t = ids[transitions[k][0]] if k in transitions else dead
+                inverse[a].setdefault(t, []).append(s)
+            inverse[a].setdefault(dead, []).append(dead)
+
+        # start from the same groups as the moore engine, the dead state gets its own group
+        blocks: list[set[int]] = [{ids[state] for state in g} for g in self.list_of_groups if g]
+        blocks.append({dead})
+        block_of = [0] * (dead + 1)
+        for b, block in enumerate(blocks):
+            for s in block:
+                block_of[s] = b
+
+        # the worklist of splitters (block, input), all the groups but the largest one are enough
+        largest = max(range(len(blocks)), key=lambda b: len(blocks[b]))
+        work = [(b, a) for b in range(len(blocks)) if b != largest for a in range(len(inputs))]
+        in_work = set(work)
+        while work:
+            splitter = work.pop()
+            in_work.remove(splitter)
+            self.refinement_passes += 1
+            b, a = splitter
+            # the states going into the splitter block with input a, grouped by their block
+            touched: dict[int, list[int]] = {}
+            for t in blocks[b]:
+                for s in inverse[a].get(t, ()):
+                    touched.setdefault(block_of[s], []).append(s)
+
+            for y, members in touched.items():
+                if len(members) == len(blocks[y]):
+                    continue
+                # split y into the states that go into the splitter and the rest
+                z = len(blocks)
+                blocks.append(set(members))
+                blocks[y].difference_update(members)
+                for s in members:
+                    block_of[s] = z
+                for c in range(len(inputs)):
+                    if (y, c) in in_work:
+                        new_splitter = (z, c)
+                    else:
+                        new_splitter = (y, c) if len(blocks[y]) <= len(blocks[z]) else (z, c)
+                    if new_splitter not in in_work:
+                        in_work.add(new_splitter)
+                        work.append(new_splitter)
+
+        self.list_of_groups = [{states[s] for s in block} for block in blocks if dead not in block]
+
     def reconstruct_dfa(self) -> AutomataMachine:
+        with CompileStats.measure(self.stats, 'reconstruct') as stage:
+            new_dfa = self.merge_groups()
+            stage.counts.update(states=len(new_dfa.states),
+                                transitions=sum(len(s.transitions) for s in new_dfa.states.values()))
+        return new_dfa
+
+    def merge_groups(self) -> AutomataMachine:
         # create a new dfa with the new groups
         # get copy of the old dfa
         old_states = self.dfa.states.copy()
@@ -321,15 +548,17 @@ class DFA_Minimizer:
                 new_starting_state = i
             new_transitions = {}
             is_terminal = False
+            tag = NO_TAG
             for state in group:
                 s = old_states[state]
                 is_terminal = is_terminal or s.is_terminating_state
+                tag = s.tag
                 for k, v in s.transitions.items():
                     # transitions should be one-to-one as we have a dfa here
                     new_transitions[k] = [self.get_group(v[0])]
 
             # add the new state to the new dfa
-            new_dfa.add_state(i, is_terminal, new_transitions)
+            new_dfa.add_state(i, is_terminal, new_transitions, tag)
         new_dfa.starting_state = new_starting_state
 
         return new_dfa
@@ -345,7 +574,6 @@ if __name__ == "__main__":
     state_machine.draw()
 
     dfa_gen = dfa_generator('output.json')
-    # aa = dfa.get_closure(dfa.nfa_sm.get_state('S2'))
     new_dfa = dfa_gen.convert_to_dfa()
     new_dfa.draw()
     new_dfa.save_to_json('dfa.json')
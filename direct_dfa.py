@@ -0,0 +1,76 @@
+from alphabet import Alphabet
+from budget import CompileBudget
+from compact_nfa import EpsilonClosures
+from compile_stats import CompileStats
+from dfa_generator import AutomataMachine
+from reg_parser import RegParser
+
+
+class DirectDFA:
+    """
+    Builds the DFA of an expression straight from the postfix queue of a `RegParser` with the followpos
+    method, no NFA is built
+    the expression is augmented with an end marker placed after its last set, a DFA state is a set of
+    positions (a bitset) and it is accepting if it holds the end marker
+    the inputs of the DFA are the symbol classes of the operands like in `dfa_generator.convert_to_dfa`,
+    so the result goes to `DFA_Minimizer` the same way
+    """
+
+    def __init__(self, parser: RegParser, stats: CompileStats = None, budget: CompileBudget = None):
+        """
+        stats gets the 'direct' stage if given
+        convert_to_dfa raises `budget.BudgetExceeded` as soon as the DFA goes over budget
+        """
+        self.parser = parser
+        self.stats = stats
+        self.budget = budget
+        self.groups: list[int] = []
+
+    def convert_to_dfa(self) -> AutomataMachine:
+        """
+        DFA states are numbered 0, 1, ... in discovery order, `self.groups[i]` is the position set of state i
+        the state reached from a set with a class is the union of the follow sets of its positions matching it
+        """
+        with CompileStats.measure(self.stats, 'direct') as stage:
+            labels, follow, nullable, first, last = self.parser.positions()
+            end = len(labels) + 1
+            follow.append(0)
+            for p in EpsilonClosures.iterate_bits(last):
+                follow[p] |= 1 << end
+            start_group = first | (1 << end) if nullable else first
+
+            stage.counts['positions'] = len(labels)
+            alphabet = Alphabet(sorted(set(labels)))
+            # position_classes[p] is the symbol classes matched by position p, the end marker matches none
+            position_classes = [[]] + [alphabet.label_classes[label] for label in labels] + [[]]
+
+            # bitset -> DFA state number
+            groups_ids = {start_group: 0}
+            self.groups = [start_group]
+            states: dict[int, bool] = {}
+            transitions: dict[int, dict[str, list[int]]] = {}
+            num_transitions = 0
+            subset_bytes = CompileBudget.subset_bytes(start_group)
+            for curr_id, curr_group in enumerate(self.groups):
+                states[curr_id] = bool(curr_group >> end & 1)
+                next_groups: dict[int, int] = {}
+                for p in EpsilonClosures.iterate_bits(curr_group):
+                    for c in position_classes[p]:
+                        next_groups[c] = next_groups.get(c, 0) | follow[p]
+                transitions[curr_id] = {}
+                num_transitions += len(next_groups)
+                for c, next_group in next_groups.items():
+                    if next_group not in groups_ids:
+                        groups_ids[next_group] = len(self.groups)
+                        self.groups.append(next_group)
+                        subset_bytes += CompileBudget.subset_bytes(next_group)
+                    transitions[curr_id][alphabet.class_labels[c]] = [groups_ids[next_group]]
+                if self.budget is not None:
+                    self.budget.check_dfa(len(self.groups), num_transitions, subset_bytes, stage.counts)
+
+            dfa = AutomataMachine(name='DFA')
+            dfa.init_from_dict(states, 0, transitions)
+            groups = self.groups
+            dfa.state_namer = lambda state: '_'.join(f'P{p}' for p in EpsilonClosures.iterate_bits(groups[state]))
+            stage.counts.update(states=len(states), transitions=num_transitions)
+        return dfa
@@ -0,0 +1,245 @@
+from typing import Optional
+from alphabet import Alphabet
+from compact_nfa import CompactNFA, EpsilonClosures
+
+UNKNOWN = -2
+DEAD = -1
+
+
+class NFASimulator:
+    """
+    Matches by running a `CompactNFA` directly, the set of current NFA states is a bitset (python int)
+    and a step ORs the precomputed moves of its states, so memory stays linear in the NFA
+    used when building the DFA goes over its `budget.CompileBudget`
+    """
+
+    def __init__(self, nfa: CompactNFA):
+        self.nfa = nfa
+        self.alphabet = Alphabet(nfa.symbols)
+        closures = EpsilonClosures(nfa)
+
+        # moves[s][c] is the bitset reached from NFA state s with symbol class c, closures included
+        self.moves: list[dict[int, int]] = []
+        for s in range(nfa.num_states):
+            moves = {}
+            for symbol_id, t in nfa.edges(s):
+                for c in self.alphabet.label_classes[nfa.symbols[symbol_id]]:
+                    moves[c] = moves.get(c, 0) | EpsilonClosures.to_bits(closures.closures[t])
+            self.moves.append(moves)
+        self.accepting_mask = 0
+        for s in range(nfa.num_states):
+            if nfa.accepting[s]:
+                self.accepting_mask |= 1 << s
+        self.start_subset = EpsilonClosures.to_bits(closures.closures[nfa.start])
+
+    def step_subset(self, subset: int, c: int) -> int:
+        next_subset = 0
+        for s in EpsilonClosures.iterate_bits(subset):
+            next_subset |= self.moves[s].get(c, 0)
+        return next_subset
+
+    def simulate(self, text: str, pos: int, subset: int, last_end: Optional[int]) -> Optional[int]:
+        """
+        Continues a match from pos on the NFA state sets without caching anything
+        """
+        get_class, other = self.alphabet.char_class.get, Alphabet.OTHER
+        for i in range(pos, len(text)):
+            subset = self.step_subset(subset, get_class(text[i], other))
+            if subset == 0:
+                break
+            if subset & self.accepting_mask:
+                last_end = i + 1
+        return last_end
+
+    def match(self, text: str, pos: int = 0) -> Optional[int]:
+        """
+        Returns the end of the longest match starting at pos, or None if there is no match
+        """
+        last_end = pos if self.start_subset & self.accepting_mask else None
+        return self.simulate(text, pos, self.start_subset, last_end)
+
+    def fullmatch(self, text: str) -> bool:
+        """
+        Returns True if the whole text is matched
+        """
+        return self.match(text) == len(text)
+
+    def search(self, text: str, pos: int = 0) -> Optional[tuple[int, int]]:
+        """
+        Returns the (start, end) of the leftmost longest match at or after pos, or None if there is no match
+        the attempts starting at every position run together in one pass like in `matcher.MatchThreads`,
+        an attempt is a subset of the NFA states and an NFA state reached by several attempts is only kept
+        in the one starting first, so the subsets are disjoint and a step costs at most one move per NFA state
+        """
+        if self.start_subset & self.accepting_mask:
+            # the empty match at pos is the leftmost one
+            return pos, self.match(text, pos)
+        get_class, other, accepting_mask = self.alphabet.char_class.get, Alphabet.OTHER, self.accepting_mask
+        # the live attempts as (subset, start) pairs by increasing start
+        threads: list[tuple[int, int]] = []
+        # the union of their subsets
+        live = 0
+        best = None
+        for i in range(pos, len(text)):
+            c = get_class(text[i], other)
+            if best is None and self.start_subset & ~live:
+                threads.append((self.start_subset & ~live, i))
+            next_threads = []
+            live = 0
+            for subset, begin in threads:
+                if best is not None and begin > best[0]:
+                    # starts after the leftmost match, it can't win
+                    break
+                next_subset = self.step_subset(subset, c) & ~live
+                if next_subset == 0:
+                    continue
+                live |= next_subset
+                next_threads.append((next_subset, begin))
+                if next_subset & accepting_mask:
+                    best = (begin, i + 1)
+            threads = next_threads
+            if not threads and best is not None:
+                break
+        return best
+
+
+class LazyDFA(NFASimulator):
+    """
+    Determinizes a `CompactNFA` on demand while matching
+    a DFA state is a bitset of NFA states, it is created the first time the input reaches it
+    and its transitions are filled one symbol class at a time
+    the cache holds at most max_states states, when it is full it is flushed and rebuilt from the current state
+    if one call flushes more than max_flushes times the cache is thrashing and the rest of
+    the input is matched by simulating the NFA state sets directly
+    search first runs the subsets with the start subset added at every step, which are cached as states too
+    """
+
+    def __init__(self, nfa: CompactNFA, max_states: int = 4096, max_flushes: int = 8):
+        if max_states < 2:
+            # a flush keeps the current state and the one it moves to
+            raise Exception(f"LazyDFA needs max_states of at least 2, got {max_states}")
+        super().__init__(nfa)
+        self.max_states = max_states
+        self.max_flushes = max_flushes
+        self.num_flushes = 0
+        self.num_fallbacks = 0
+        self.flush()
+
+    def flush(self):
+        # bitset -> cached state
+        self.ids: dict[int, int] = {}
+        self.subsets: list[int] = []
+        # rows[state][c] is the next cached state, DEAD or UNKNOWN if not computed yet
+        self.rows: list[list[int]] = []
+        # search_rows[state][c] is 2 * the next cached state with the start subset added, + 1 if no NFA state
+        # was reached before adding it, or UNKNOWN
+        self.search_rows: list[list[int]] = []
+        self.accepting: list[bool] = []
+
+    @property
+    def num_cached_states(self) -> int:
+        return len(self.subsets)
+
+    def add_state(self, subset: int) -> int:
+        if subset in self.ids:
+            return self.ids[subset]
+        self.ids[subset] = len(self.subsets)
+        self.subsets.append(subset)
+        self.rows.append([UNKNOWN] * self.alphabet.num_classes)
+        self.search_rows.append([UNKNOWN] * self.alphabet.num_classes)
+        self.accepting.append(bool(subset & self.accepting_mask))
+        return len(self.subsets) - 1
+
+    def start_state(self) -> int:
+        if self.start_subset not in self.ids and self.num_cached_states >= self.max_states:
+            self.num_flushes += 1
+            self.flush()
+        return self.add_state(self.start_subset)
+
+    def compute(self, state: int, c: int) -> int:
+        """
+        Fills rows[state][c], the ids of all the cached states change if the cache gets flushed
+        """
+        subset = self.subsets[state]
+        next_subset = self.step_subset(subset, c)
+        if next_subset == 0:
+            self.rows[state][c] = DEAD
+            return DEAD
+        if next_subset not in self.ids and self.num_cached_states >= self.max_states:
+            self.num_flushes += 1
+            self.flush()
+            state = self.add_state(subset)
+        next_state = self.add_state(next_subset)
+        self.rows[state][c] = next_state
+        return next_state
+
+    def compute_search(self, state: int, c: int) -> int:
+        """
+        Fills search_rows[state][c], the ids of all the cached states change if the cache gets flushed
+        """
+        subset = self.subsets[state]
+        stepped = self.step_subset(subset, c)
+        next_subset = stepped | self.start_subset
+        if next_subset not in self.ids and self.num_cached_states >= self.max_states:
+            self.num_flushes += 1
+            self.flush()
+            state = self.add_state(subset)
+        value = 2 * self.add_state(next_subset) + (stepped == 0)
+        self.search_rows[state][c] = value
+        return value
+
+    def search(self, text: str, pos: int = 0) -> Optional[tuple[int, int]]:
+        """
+        Returns the (start, end) of the leftmost longest match at or after pos, or None if there is no match
+        the cached states with the start subset added at every step find the first end of a match, the
+        attempts started before the last step where they all died can't match, the leftmost longest match is
+        then searched from there by the NFA state sets
+        """
+        if self.start_subset & self.accepting_mask:
+            return pos, self.match(text, pos)
+        get_class, other = self.alphabet.char_class.get, Alphabet.OTHER
+        flushes = self.num_flushes
+        state = self.start_state()
+        restart = pos
+        for i in range(pos, len(text)):
+            c = get_class(text[i], other)
+            value = self.search_rows[state][c]
+            if value == UNKNOWN:
+                value = self.compute_search(state, c)
+                if self.num_flushes - flushes > self.max_flushes:
+                    self.num_fallbacks += 1
+                    break
+            state = value >> 1
+            if value & 1:
+                restart = i + 1
+            if self.accepting[state]:
+                break
+        else:
+            return None
+        return super().search(text, restart)
+
+    def match(self, text: str, pos: int = 0) -> Optional[int]:
+        """
+        Returns the end of the longest match starting at pos, or None if there is no match
+        """
+        get_class, other = self.alphabet.char_class.get, Alphabet.OTHER
+        flushes = self.num_flushes
+        state = self.start_state()
+        last_end = pos if self.accepting[state] else None
+        for i in range(pos, len(text)):
+            c = get_class(text[i], other)
+            next_state = self.rows[state][c]
+            if next_state == UNKNOWN:
+                next_state = self.compute(state, c)
+                if next_state != DEAD and self.num_flushes - flushes > self.max_flushes:
+                    self.num_fallbacks += 1
+                    subset = self.subsets[next_state]
+                    if subset & self.accepting_mask:
+                        last_end = i + 1
+                    return self.simulate(text, i + 1, subset, last_end)
+            if next_state == DEAD:
+                break
+            state = next_state
+            if self.accepting[state]:
+                last_end = i + 1
+        return last_end
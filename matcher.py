@@ -0,0 +1,305 @@
+from array import array
+from typing import Optional
+from alphabet import Alphabet
+from compact_nfa import NO_TAG
+
+DEAD = -1
+
+
+class MatchThreads:
+    """
+    The match attempts of a `DFAMatcher` starting at every position, run together in one forward pass to find
+    the leftmost longest matches one after the other, without overlaps and skipping empty matches
+    two attempts reaching the same state behave the same from then on so only the one starting first is kept,
+    at most one per state
+    the attempts are grouped in levels: level 0 looks for the next match, and once a level has a match
+    (start, end) that isn't final yet, because an attempt of the level that started earlier or at the same
+    position is still alive, the next level looks for the match that follows it from end
+    a new match in a level replaces its match and drops the deeper levels, the attempt that found it is
+    already at the new end, so nothing is ever read again
+    an attempt reaching the state of an attempt of a lower level is dropped too, if one of them matches so
+    does the other one, and that match drops its level
+    """
+
+    def __init__(self, matcher: 'DFAMatcher'):
+        self.matcher = matcher
+        # the live attempts as (state, start, level) by increasing start, the levels don't decrease
+        self.threads: list[tuple[int, int, int]] = []
+        # their states
+        self.states: set[int] = set()
+        # levels[l - first_level] is the match found by level l, the last one is None
+        self.levels: list[Optional[tuple[int, int]]] = [None]
+        self.first_level = 0
+
+    @property
+    def idle(self) -> bool:
+        """
+        True if no attempt is alive and no match is pending
+        """
+        return not self.threads and self.levels[0] is None
+
+    def step(self, c: int, i: int):
+        """
+        Starts an attempt at position i and moves all the attempts with the symbol class c of the character at i
+        """
+        matcher = self.matcher
+        table, k, accepting, start = matcher.table, matcher.num_classes, matcher.accepting, matcher.start
+        levels, first = self.levels, self.first_level
+        threads = self.threads
+        if start not in self.states:
+            threads.append((start, i, first + len(levels) - 1))
+        next_threads = []
+        seen = set()
+        # the level that found a match, the deeper ones are dropped
+        cut = None
+        for s, begin, level in threads:
+            if cut is not None and level > cut:
+                break
+            best = levels[level - first]
+            if best is not None and begin > best[0]:
+                # starts after the match of its level, it can't win
+                continue
+            t = table[s * k + c]
+            if t == DEAD or t in seen:
+                continue
+            seen.add(t)
+            next_threads.append((t, begin, level))
+            if accepting[t]:
+                levels[level - first] = (begin, i + 1)
+                cut = level
+        if cut is not None:
+            del levels[cut - first + 1:]
+            levels.append(None)
+        self.threads, self.states = next_threads, seen
+
+    def pop_match(self) -> Optional[tuple[int, int]]:
+        """
+        Removes and returns the match of level 0 if it is final, None otherwise
+        """
+        best = self.levels[0]
+        if best is None or (self.threads and self.threads[0][2] == self.first_level):
+            return None
+        del self.levels[0]
+        self.first_level += 1
+        return best
+
+    def finish(self) -> list[tuple[int, int]]:
+        """
+        Ends the input, the attempts still alive fail and the pending matches are returned in order
+        """
+        matches = [best for best in self.levels if best is not None]
+        self.first_level += len(self.levels)
+        self.threads, self.states, self.levels = [], set(), [None]
+        return matches
+
+
+class DFAMatcher:
+    """
+    Runs strings through a DFA with a dense transition table
+    every character is mapped to its symbol class, then
+    table[state * num_classes + symbol_class] is the next state or `DEAD`
+    """
+
+    def __init__(self, alphabet: Alphabet, num_states: int, start: int, table: array, accepting: bytearray,
+                 tags: array = None):
+        self.alphabet = alphabet
+        self.num_states = num_states
+        self.num_classes = alphabet.num_classes
+        self.start = start
+        self.table = table
+        # accepting[s] is 1 if s is a terminating state
+        self.accepting = accepting
+        # tags[s] is the rule accepted in s for merged patterns (see `tokenizer.Tokenizer`)
+        self.tags = tags
+        # numpy versions of the tables, built on the first batch call
+        self.numpy_tables = None
+
+    @staticmethod
+    def from_automata(dfa) -> "DFAMatcher":
+        """
+        Builds the matcher from a DFA `AutomataMachine`, usually the result of `DFA_Minimizer.reconstruct_dfa`
+        """
+        states = list(dfa.states.keys())
+        ids = {state: i for i, state in enumerate(states)}
+        labels = sorted({k for s in dfa.states.values() for k in s.transitions.keys()})
+        alphabet = Alphabet(labels)
+        k = alphabet.num_classes
+
+        table = array('i', [DEAD]) * (len(states) * k)
+        accepting = bytearray(len(states))
+        tags = array('i', [NO_TAG]) * len(states)
+        for s, state in enumerate(states):
+            accepting[s] = dfa.is_terminating_state(state)
+            tags[s] = dfa.states[state].tag
+            for label, v in dfa.states[state].transitions.items():
+                t = ids[v[0]]
+                for c in alphabet.label_classes[label]:
+                    if table[s * k + c] not in (DEAD, t):
+                        raise Exception(f"State {state} has overlapping transitions on {label}")
+                    table[s * k + c] = t
+        if all(tag == NO_TAG for tag in tags):
+            tags = None
+        return DFAMatcher(alphabet, len(states), ids[dfa.get_starting_state()], table, accepting, tags)
+
+    def save(self, path: str):
+        """
+        Writes the tables in the binary format of `automaton_format`
+        """
+        import automaton_format
+        automaton_format.save(self, path)
+
+    @staticmethod
+    def load(path: str) -> "DFAMatcher":
+        import automaton_format
+        return automaton_format.load(path)
+
+    def next_state(self, state: int, ch: str) -> int:
+        return self.table[state * self.num_classes + self.alphabet.class_of(ch)]
+
+    def fullmatch(self, text: str) -> bool:
+        """
+        Returns True if the whole text is matched
+        """
+        table, k, get_class, other = self.table, self.num_classes, self.alphabet.char_class.get, Alphabet.OTHER
+        state = self.start
+        for ch in text:
+            state = table[state * k + get_class(ch, other)]
+            if state == DEAD:
+                return False
+        return bool(self.accepting[state])
+
+    def match(self, text: str, pos: int = 0) -> Optional[int]:
+        """
+        Returns the end of the longest match starting at pos, or None if there is no match
+        """
+        table, k, get_class, other = self.table, self.num_classes, self.alphabet.char_class.get, Alphabet.OTHER
+        accepting = self.accepting
+        state = self.start
+        last_end = pos if accepting[state] else None
+        for i in range(pos, len(text)):
+            state = table[state * k + get_class(text[i], other)]
+            if state == DEAD:
+                break
+            if accepting[state]:
+                last_end = i + 1
+        return last_end
+
+    def search(self, text: str, pos: int = 0) -> Optional[tuple[int, int]]:
+        """
+        Returns the (start, end) of the leftmost longest match at or after pos, or None if there is no match
+        the attempts starting at every position run together in one pass (see `MatchThreads`)
+        """
+        if self.accepting[self.start]:
+            # the empty match at pos is the leftmost one
+            return pos, self.match(text, pos)
+        get_class, other = self.alphabet.char_class.get, Alphabet.OTHER
+        threads = MatchThreads(self)
+        for i in range(pos, len(text)):
+            threads.step(get_class(text[i], other), i)
+            best = threads.pop_match()
+            if best is not None:
+                return best
+        matches = threads.finish()
+        return matches[0] if matches else None
+
+    def get_numpy_tables(self):
+        """
+        Returns (table, accepting, lut) as numpy arrays for the batch API
+        the table gets an extra dead row that loops on itself
+        lut maps a code point to its symbol class, code points past its end are in the other class
+        """
+        import numpy as np
+        if self.numpy_tables is None:
+            n, k = self.num_states, self.num_classes
+            table = np.array(self.table, dtype=np.int32).reshape(n, k)
+            dense = np.empty((n + 1, k), dtype=np.int32)
+            dense[:n] = np.where(table == DEAD, n, table)
+            dense[n] = n
+
+            accepting = np.zeros(n + 1, dtype=bool)
+            accepting[:n] = np.frombuffer(bytes(self.accepting), dtype=np.uint8) != 0
+
+            char_class = self.alphabet.char_class
+            lut = np.full(max([ord(ch) for ch in char_class], default=0) + 1, Alphabet.OTHER, dtype=np.int32)
+            for ch, c in char_class.items():
+                lut[ord(ch)] = c
+            self.numpy_tables = (dense, accepting, lut)
+        return self.numpy_tables
+
+    def fullmatch_many(self, texts, return_lengths: bool = False, batch_size: int = 1 << 16,
+                       scalar_rows: int = 16):
+        """
+        Matches many strings at once with numpy
+        texts is a list or an array of strings, every batch of batch_size strings is encoded to UTF-32 in one go
+        and mapped to symbol classes, nothing is padded
+        the strings of a batch are sorted longest first, so the ones still running at position j are a prefix
+        of that order and step j only moves them, once scalar_rows strings or less are left they are finished
+        one at a time with the table, so one long string doesn't cost a numpy step per character
+        returns a boolean array, True where the whole string is matched
+        with return_lengths it returns (matched, lengths) where lengths is the longest matched prefix or -1
+        numpy string arrays drop trailing NUL characters, so strings ending with '\\x00' must be given in a list
+        """
+        import numpy as np
+        dense, accepting, lut = self.get_numpy_tables()
+        flat, k, dead = dense.ravel(), self.num_classes, self.num_states
+
+        matched = np.zeros(len(texts), dtype=bool)
+        lengths = np.full(len(texts), -1, dtype=np.int64)
+        for first in range(0, len(texts), batch_size):
+            batch = texts[first:first + batch_size]
+            if isinstance(batch, np.ndarray):
+                batch = batch.tolist()
+            size = len(batch)
+            text_lengths = np.fromiter(map(len, batch), dtype=np.int64, count=size)
+            order = np.argsort(-text_lengths, kind='stable')
+            sorted_lengths = text_lengths[order]
+            # where every string starts in the batch, in the sorted order
+            starts = np.zeros(size, dtype=np.int64)
+            np.cumsum(text_lengths[:-1], out=starts[1:])
+            starts = starts[order]
+            codes = np.frombuffer(''.join(batch).encode('utf-32-le'), dtype=np.uint32)
+            classes = lut[np.minimum(codes, len(lut) - 1)]
+            classes[codes >= len(lut)] = Alphabet.OTHER
+            # running[j] is the number of strings longer than j
+            width = int(sorted_lengths[0]) if size else 0
+            running = size - np.cumsum(np.bincount(text_lengths, minlength=width + 1))
+
+            states = np.full(size, self.start, dtype=np.int32)
+            batch_lengths = np.full(size, 0 if accepting[self.start] else -1, dtype=np.int64)
+            for j in range(width):
+                live = int(running[j])
+                if live <= scalar_rows:
+                    self.finish_rows(batch, order[:live], starts[:live], states, batch_lengths, j, classes)
+                    break
+                step = np.take(flat, states[:live] * k + np.take(classes, starts[:live] + j))
+                states[:live] = step
+                if return_lengths:
+                    batch_lengths[:live][accepting[step]] = j + 1
+                if (step == dead).all():
+                    break
+            matched[first + order] = accepting[states]
+            lengths[first + order] = batch_lengths
+
+        if return_lengths:
+            return matched, lengths
+        return matched
+
+    def finish_rows(self, batch: list[str], rows, starts, states, lengths, pos: int, classes):
+        """
+        Runs the first len(rows) strings of a sorted batch from position pos to their end with the table,
+        states and lengths are updated in place, classes are the symbol classes of the whole batch
+        """
+        table, k, accepting = self.table, self.num_classes, self.accepting
+        for r in range(len(rows)):
+            state = int(states[r])
+            if state == self.num_states:
+                continue
+            start = int(starts[r])
+            for i, c in enumerate(classes[start + pos:start + len(batch[rows[r]])].tolist(), pos):
+                state = table[state * k + c]
+                if state == DEAD:
+                    state = self.num_states
+                    break
+                if accepting[state]:
+                    lengths[r] = i + 1
+            states[r] = state
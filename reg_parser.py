@@ -1,13 +1,10 @@
 import json
+from compact_nfa import CompactNFA, CompactNFABuilder, EpsilonClosures
+from compile_stats import CompileStats
 
 class Validator:
 
     alphanumeric = list('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789')
-    dot = list('.')
-    parentheses = list('()')
-    brackets = list('[]')
-    operators = list('|&*-?+')
-    terminals = alphanumeric + dot + parentheses + brackets + operators
 
     S = '_S'
     A = '_A'
@@ -29,101 +26,70 @@ class Validator:
         C: [[c] for c in alphanumeric]
     }
 
-    rule2Index = {
-        S: 0,
-        A: 1,
-        B: 2,
-        E: 3,
-        R: 4,
-        G: 5,
-        T: 6,
-        C: 7
-    }
-    index2Rule = {v: k for k, v in rule2Index.items()}
+    # states of the linear validator (see `Validator.step`)
+    EXPECT_OPERAND = 0  # start of the expression or after '(' or '|'
+    AFTER_OPERAND = 1   # after a character, '.', ')' or ']'
+    AFTER_REPEAT = 2    # after '*', '+' or '?', they can't be repeated
+    CLASS_START = 3     # right after '['
+    CLASS_CHAR = 4      # after a single character inside []
+    CLASS_DASH = 5      # after the '-' of a range inside []
+    CLASS_RANGE = 6     # after a whole range like a-c inside []
+    ERROR = -1
 
-    @staticmethod
-    def is_terminal(c: str) -> bool:
-        return c in Validator.terminals
+    alphanumeric_set = frozenset(alphanumeric)
+    repeat_operators = frozenset('*+?')
 
     @staticmethod
-    def all_terminals(rule: list[str]) -> bool:
-        return all([Validator.is_terminal(c) for c in rule])
-
-    def contains_terminals(rule: list[str]) -> bool:
-        return any([Validator.is_terminal(c) for c in rule])
+    def step(state: int, depth: int, c: str) -> tuple[int, int]:
+        """
+        Moves the validator one character forward, this is a deterministic
+        version of `Validator.rules` where `depth` counts the open parentheses
+        returns the new (state, depth), state is `Validator.ERROR` if `c` is not allowed here
+        """
+        if state >= Validator.CLASS_START:
+            # inside [] only C and C-C are allowed
+            if c in Validator.alphanumeric_set:
+                return (Validator.CLASS_RANGE if state == Validator.CLASS_DASH else Validator.CLASS_CHAR), depth
+            if c == '-' and state == Validator.CLASS_CHAR:
+                return Validator.CLASS_DASH, depth
+            if c == ']' and (state == Validator.CLASS_CHAR or state == Validator.CLASS_RANGE):
+                return Validator.AFTER_OPERAND, depth
+            return Validator.ERROR, depth
+
+        if c in Validator.alphanumeric_set or c == '.':
+            return Validator.AFTER_OPERAND, depth
+        if c == '(':
+            return Validator.EXPECT_OPERAND, depth + 1
+        if c == '[':
+            return Validator.CLASS_START, depth
+        if c in Validator.repeat_operators and state == Validator.AFTER_OPERAND:
+            return Validator.AFTER_REPEAT, depth
+        if c == '|' and state != Validator.EXPECT_OPERAND:
+            return Validator.EXPECT_OPERAND, depth
+        if c == ')' and state != Validator.EXPECT_OPERAND and depth > 0:
+            return Validator.AFTER_OPERAND, depth - 1
+        return Validator.ERROR, depth
 
     @staticmethod
-    def get_indices_inbound(c: str, l: int, r: int, symbolIndices: dict[str, list[int]]) -> list[int]:
-        if c not in symbolIndices:
-            return []
-        return [i for i in symbolIndices[c] if l <= i <= r]
+    def find_error(reg: str) -> int:
+        """
+        Validates the expression in a single left to right pass
+        returns the index of the first offending character, len(reg) if the expression ends too early
+        and -1 if the expression is valid
+        """
+        state = Validator.EXPECT_OPERAND
+        depth = 0
+        for i, c in enumerate(reg):
+            state, depth = Validator.step(state, depth, c)
+            if state == Validator.ERROR:
+                return i
+        if depth > 0 or not (state == Validator.AFTER_OPERAND or state == Validator.AFTER_REPEAT):
+            return len(reg)
+        return -1
 
-    @staticmethod
-    def solve(left: int, right:int, idx: int, reg: str, symbolIndices: dict[str, list[int]], mem) -> bool:
-        if mem[left][right][idx] != -1:
-            return mem[left][right][idx]
-        if left > right:
-            mem[left][right][idx] = False
-            return mem[left][right][idx]
-        rule = Validator.index2Rule[idx]
-        for r in Validator.rules[rule]:
-            # case1 r contains terminals only
-            # base case
-            if Validator.all_terminals(r):
-                if reg[left:right+1] == ''.join(r):
-                    mem[left][right][idx]= True
-                    return mem[left][right][idx]
-            # case2 r contains terminals
-            elif Validator.contains_terminals(r):
-                # brackets
-                if Validator.is_terminal(r[0]) and Validator.is_terminal(r[-1]):
-                    terminal_indices_left = Validator.get_indices_inbound(r[0], left, right, symbolIndices)
-                    terminal_indices_right = Validator.get_indices_inbound(r[-1], left, right, symbolIndices)
-                    if len(terminal_indices_left) > 0 and len(terminal_indices_right)>0 and left == terminal_indices_left[0] and right == terminal_indices_right[-1] and Validator.solve(left+1, right-1, Validator.rule2Index[r[1]],reg,symbolIndices,mem):
-                        mem[left][right][idx]= True
-                        return mem[left][right][idx]
-                else:
-                    # r[1] is a terminal
-                    terminal_indices = Validator.get_indices_inbound(r[1], left, right, symbolIndices)
-                    for i in terminal_indices:
-                        if Validator.solve(left, i-1, Validator.rule2Index[r[0]],reg,symbolIndices,mem):
-                            if len(r) == 2:
-                                if i == right:
-                                    mem[left][right][idx]=True
-                                    return mem[left][right][idx]
-                            elif Validator.solve(i+1, right, Validator.rule2Index[r[2]],reg,symbolIndices,mem):
-                                mem[left][right][idx]=True
-                                return mem[left][right][idx]
-            # case3 r contains non-terminals only
-            else:
-                # match all string
-                if len(r) == 1:
-                    if Validator.solve(left, right, Validator.rule2Index[r[0]],reg,symbolIndices,mem):
-                        mem[left][right][idx] =True
-                        return mem[left][right][idx]
-                else:
-                # match till right-1
-                    for i in range(left, right):
-                        if Validator.solve(left, i, Validator.rule2Index[r[0]],reg,symbolIndices,mem) and Validator.solve(i+1, right, Validator.rule2Index[r[1]],reg,symbolIndices,mem):
-                            mem[left][right][idx]=True
-                            return mem[left][right][idx]
-        mem[left][right][idx]= False
-        return False
-    @staticmethod
-    def fill_symbol_indices(reg: str) -> dict[str, list[int]]:
-        symbolIndices = {}
-        for i,c in enumerate(reg):
-            if c not in symbolIndices:
-                symbolIndices[c] = [i]
-            else:
-                symbolIndices[c].append(i)
-        return symbolIndices
-    
     @staticmethod
     def validate(reg: str) -> bool:
-        symbolIndices = Validator.fill_symbol_indices(reg)
-        mem = [[[-1 for _ in range(len(Validator.rules))] for _ in range(len(reg))] for _ in range(len(reg))]
-        return Validator.solve(0, len(reg)-1, Validator.rule2Index[Validator.S], reg, symbolIndices, mem)
+        return Validator.find_error(reg) == -1
 
 
 class Operator:
@@ -182,29 +148,10 @@ class Transition:
 
 
 unary_operators = ['*', '+', '?']
-binary_operators = ['|', '&', '-']
 opening_brackets = ['(']
 closing_brackets = [')']
 
 
-class Preprocessor:
-    @staticmethod
-    def preprocess(text):
-        ret = ""
-        sz = len(text)
-        square_brackets = 0
-        i = 0
-        while i < sz-1:
-            ret += text[i]
-            square_brackets += (text[i] == '[')
-            square_brackets -= (text[i] == ']')
-            if square_brackets==0 and not (text[i] in binary_operators or text[i] in opening_brackets or text[i+1] in binary_operators or text[i+1] in closing_brackets or text[i+1] in unary_operators):
-                ret += '&'
-            i += 1
-        ret += text[sz-1]
-        return ret
-
-
 class FA:
     def __init__(self) -> None:
         self.start = None
@@ -272,96 +219,127 @@ class FA:
         operand.end.transitions.append(Transition("eps", self.end))
 
 
+class Token:
+    """
+    A typed item of the postfix queue built by `FrontEnd`
+    """
+    CHAR = 'char'
+    DOT = 'dot'
+    CLASS = 'class'
+    OPERATOR = 'operator'
+
+    def __init__(self, kind: str, value: str):
+        self.kind = kind
+        # the text of the token, for a CLASS token it is the whole block like [a-c5]
+        # it is the edge label, `alphabet.parse_label` reads its ranges once per distinct label
+        self.value = value
+
+    def __repr__(self):
+        return self.value
+
+
+class FrontEnd:
+    @staticmethod
+    def push_operator(op: str, st: list[str], q: list[Token]):
+        while len(st) > 0 and Operator.precedence(st[-1]) is not None and Operator.precedence(st[-1]) <= Operator.precedence(op):
+            q.append(Token(Token.OPERATOR, st.pop()))
+        st.append(op)
+
+    @staticmethod
+    def to_postfix(text: str) -> list[Token]:
+        """
+        Tokenizes, validates and converts the expression to postfix in a single pass
+        the implicit concatenation '&' is inserted while scanning and a [] block becomes one CLASS token
+        """
+        q: list[Token] = []
+        st: list[str] = []
+        state = Validator.EXPECT_OPERAND
+        depth = 0
+        class_start = 0
+        for i, c in enumerate(text):
+            prev_state = state
+            state, depth = Validator.step(state, depth, c)
+            if state == Validator.ERROR:
+                raise Exception(f"Invalid Regular Expression at position {i}")
+
+            # case 1: inside square brackets
+            if prev_state >= Validator.CLASS_START:
+                if state == Validator.AFTER_OPERAND:
+                    q.append(Token(Token.CLASS, text[class_start:i+1]))
+                continue
+
+            # case 2: an operand or an opening bracket right after an operand is a concatenation
+            if (state == Validator.AFTER_OPERAND and c != ')') or c == '(' or c == '[':
+                if prev_state == Validator.AFTER_OPERAND or prev_state == Validator.AFTER_REPEAT:
+                    FrontEnd.push_operator('&', st, q)
+
+            if c == '.':
+                q.append(Token(Token.DOT, c))
+            elif c in Validator.alphanumeric_set:
+                q.append(Token(Token.CHAR, c))
+            elif c == '[':
+                class_start = i
+            elif c in opening_brackets:
+                st.append(c)
+            elif c in closing_brackets:
+                while st[-1] != '(':
+                    q.append(Token(Token.OPERATOR, st.pop()))
+                st.pop()
+            elif c in unary_operators:
+                # unary operators bind tighter than anything, they can go to the output directly
+                q.append(Token(Token.OPERATOR, c))
+            else:
+                FrontEnd.push_operator(c, st, q)
+
+        if depth > 0 or not (state == Validator.AFTER_OPERAND or state == Validator.AFTER_REPEAT):
+            raise Exception(f"Invalid Regular Expression at position {len(text)}")
+        while len(st) > 0:
+            q.append(Token(Token.OPERATOR, st.pop()))
+        return q
+
+
 class RegParser:
-    def __init__(self, text):
-        if not Validator.validate(text):
-            raise Exception("Invalid Regular Expression")
-        self.text = Preprocessor.preprocess(text)
-        print(self.text)
+    constructions = ['thompson', 'glushkov']
+
+    def __init__(self, text, stats: CompileStats = None):
+        self.text = text
+        # gets the 'build' and 'nfa' stages if given
+        self.stats = stats
         self.build()
-        print(self.q)
         self.states: list[State] = []
 
     def build(self):
-        q = []
-        text = self.text
-        st = []
-        sz = len(text)
-        i = 0
-        while i<sz:
-            # case 1: alphabet, digit, dot
-            if text[i].isalpha() or text[i].isdigit() or text[i] == '.' or text[i] == '-':
-                q.append(text[i])
-            # case 2: operators
-            elif Operator.precedence(text[i]) is not None:
-                while len(st) > 0 and Operator.precedence(st[-1]) is not None and Operator.precedence(st[-1]) <= Operator.precedence(text[i]):
-                    q.append(st.pop())
-                st.append(text[i])
-            # case 3: opening brackets
-            elif text[i] in opening_brackets:
-                st.append(text[i])
-            # case 4: closing brackets
-            elif text[i] in closing_brackets:
-                opening = '('
-                while len(st) > 0 and st[-1] != opening:
-                    q.append(st.pop())
-                if len(st) == 0:
-                    raise Exception("Invalid Regular Expression")
-                st.pop()
-            elif text[i] == '[':
-                while i<sz and text[i] != ']':
-                    q.append(text[i])
-                    i += 1
-                q.append(text[i])
-            i+=1
-        while (len(st) > 0):
-            if (st[-1] in opening_brackets):
-                raise Exception("Invalid Regular Expression")
-            else:
-                q.append(st[-1])
-            st.pop()
-        self.q = q
-
-    @staticmethod
-    def is_operand(c):
-        return c.isalpha() or c.isdigit() or c == '.'
+        with CompileStats.measure(self.stats, 'build') as stage:
+            self.q = FrontEnd.to_postfix(self.text)
+            stage.counts['tokens'] = len(self.q)
 
     def parse(self):
-        sz = len(self.q)
         st: list[FA] = []
-        i = 0
-        while i < sz:
+        for token in self.q:
             fa = FA()
-            if not RegParser.is_operand(self.q[i]):
-                if self.q[i] == '|':
+            if token.kind == Token.OPERATOR:
+                if token.value == '|':
                     fa.add_or_FA([st[-2], st[-1]], self.states)
                     st.pop()
                     st.pop()
-                elif self.q[i] == '&':
+                elif token.value == '&':
                     fa.add_and_FA([st[-2], st[-1]], self.states)
                     st.pop()
                     st.pop()
-                elif self.q[i] == '*':
+                elif token.value == '*':
                     fa.add_asterisk_FA(st[-1], self.states)
                     st.pop()
-                elif self.q[i] == '+':
+                elif token.value == '+':
                     fa.add_plus_FA(st[-1], self.states)
                     st.pop()
-                elif self.q[i] == '?':
+                elif token.value == '?':
                     fa.add_question_mark_FA(st[-1], self.states)
                     st.pop()
-                elif self.q[i] == '[':
-                    i+=1
-                    substr = '['
-                    while i<sz and self.q[i] != ']':
-                        substr += self.q[i]
-                        i += 1
-                    substr += self.q[i]
-                    fa.add_square_bracket_FA(substr, self.states)
+            elif token.kind == Token.CLASS:
+                fa.add_square_bracket_FA(token.value, self.states)
             else:
-                fa.add_operand_FA(self.q[i], self.states)
+                fa.add_operand_FA(token.value, self.states)
             st.append(fa)
-            i += 1
         st[-1].end.is_terminating = True
         ret = {
             "startingState": f'S{st[-1].start.id}',
@@ -370,8 +348,113 @@ class RegParser:
             ret.update(s.to_json())
         return ret
 
+    def parse_compact(self, construction: str = 'thompson') -> CompactNFA:
+        """
+        Builds the same Thompson NFA as `RegParser.parse` without creating `State` objects
+        states are numbered from 0 and the result is packed into a `CompactNFA`
+        construction 'glushkov' builds the epsilon free position automaton instead, see `RegParser.build_glushkov`
+        """
+        if construction not in RegParser.constructions:
+            raise Exception(f"Unknown NFA construction {construction}")
+        with CompileStats.measure(self.stats, 'nfa') as stage:
+            nfa = self.build_glushkov() if construction == 'glushkov' else self.build_compact()
+            stage.counts.update(states=nfa.num_states, edges=nfa.num_edges, eps_edges=nfa.num_eps_edges)
+        return nfa
+
+    def build_compact(self) -> CompactNFA:
+        builder = CompactNFABuilder()
+        # every fragment is a (start, end) pair of states
+        st: list[tuple[int, int]] = []
+        for token in self.q:
+            if token.kind != Token.OPERATOR:
+                start, end = builder.add_state(), builder.add_state()
+                builder.add_edge(start, token.value, end)
+            elif token.value == '&':
+                (start, middle), (middle_next, end) = st[-2], st[-1]
+                st.pop()
+                st.pop()
+                builder.add_eps(middle, middle_next)
+            elif token.value == '|':
+                operands = [st[-2], st[-1]]
+                st.pop()
+                st.pop()
+                start, end = builder.add_state(), builder.add_state()
+                for operand_start, operand_end in operands:
+                    builder.add_eps(start, operand_start)
+                    builder.add_eps(operand_end, end)
+            else:
+                operand_start, operand_end = st.pop()
+                start, end = builder.add_state(), builder.add_state()
+                # '*' and '?' can skip the operand, '*' and '+' can repeat it
+                if token.value != '+':
+                    builder.add_eps(start, end)
+                builder.add_eps(start, operand_start)
+                builder.add_eps(operand_end, end)
+                if token.value != '?':
+                    builder.add_eps(operand_end, start)
+            st.append((start, end))
+        return builder.build(st[-1][0], [st[-1][1]])
+
+    def positions(self) -> tuple[list[str], list[int], bool, int, int]:
+        """
+        The position sets of the expression, position i is its i-th operand counting from 1
+        returns the labels of the positions (labels[i - 1] is position i), the follow set of every position,
+        and whether the expression is nullable with its first and last sets
+        the sets are bitsets of positions, follow[0] is the first set so position 0 acts as a start
+        """
+        labels: list[str] = []
+        # follow[i] is the positions that can come right after position i
+        follow: list[int] = [0]
+        # every fragment is a (nullable, first, last) triple
+        st: list[tuple[bool, int, int]] = []
+        for token in self.q:
+            if token.kind != Token.OPERATOR:
+                labels.append(token.value)
+                follow.append(0)
+                position = 1 << len(labels)
+                st.append((False, position, position))
+                continue
+            if token.value == '&' or token.value == '|':
+                (nullable1, first1, last1), (nullable2, first2, last2) = st[-2], st[-1]
+                st.pop()
+                st.pop()
+                if token.value == '|':
+                    st.append((nullable1 or nullable2, first1 | first2, last1 | last2))
+                    continue
+                for p in EpsilonClosures.iterate_bits(last1):
+                    follow[p] |= first2
+                st.append((nullable1 and nullable2, first1 | first2 if nullable1 else first1,
+                           last1 | last2 if nullable2 else last2))
+                continue
+            nullable, first, last = st.pop()
+            # '*' and '+' can repeat the operand, '*' and '?' can skip it
+            if token.value != '?':
+                for p in EpsilonClosures.iterate_bits(last):
+                    follow[p] |= first
+            st.append((nullable or token.value != '+', first, last))
+
+        nullable, first, last = st[-1]
+        follow[0] = first
+        return labels, follow, nullable, first, last
+
+    def build_glushkov(self) -> CompactNFA:
+        """
+        The position automaton: state 0 is the start and state i is position i (see `RegParser.positions`)
+        every edge going into state i is labeled with operand i, so the NFA has no epsilon edges
+        the edges are the follow sets, up to n^2 of them for n operands instead of the O(n) of Thompson
+        """
+        labels, follow, nullable, first, last = self.positions()
+        builder = CompactNFABuilder()
+        builder.num_states = len(labels) + 1
+        for p in range(len(labels) + 1):
+            for q in EpsilonClosures.iterate_bits(follow[p]):
+                builder.add_edge(p, labels[q - 1], q)
+        return builder.build(0, list(EpsilonClosures.iterate_bits(last | 1 if nullable else last)))
+
 if __name__ == '__main__':
     parser = RegParser("[a*7]")
+    print(parser.text)
+    print(parser.q)
     ans = parser.parse()
     print(ans)
     with open("output.json", "w") as f:
@@ -0,0 +1,121 @@
+import mmap
+from typing import BinaryIO, Iterator
+from matcher import DFAMatcher, DEAD, MatchThreads
+
+
+class StreamScanner:
+    """
+    Finds the leftmost longest matches of a `DFAMatcher` in binary input without reading it all in memory
+    every byte is taken as the character with the same code (latin-1)
+    matches are yielded as (start, end) offsets and don't overlap, empty matches are skipped
+    all the attempts starting at different bytes run in one forward pass with `MatchThreads`, so every byte
+    is read once and none is kept, only the matches still pending are
+    """
+
+    def __init__(self, matcher: DFAMatcher, chunk_size: int = 1 << 20):
+        self.matcher = matcher
+        self.chunk_size = chunk_size
+        # byte -> symbol class
+        self.byte_classes = [matcher.alphabet.class_of(chr(b)) for b in range(256)]
+        # translation table marking the bytes that can begin a non empty match with 1
+        k = matcher.num_classes
+        self.start_bytes = bytes(
+            matcher.table[matcher.start * k + self.byte_classes[b]] != DEAD for b in range(256))
+
+    def scan(self, data, threads: MatchThreads, final: bool, base: int = 0):
+        """
+        Yields the matches in data (bytes, bytearray or mmap), data[0] is the byte at offset base
+        it returns once data is read, if final is False the attempts still alive stay in threads and
+        continue when the next data comes, starting at offset base + len(data)
+        """
+        byte_classes, start_bytes, start_state = self.byte_classes, self.start_bytes, self.matcher.start
+        n = len(data)
+        i = 0
+        # data[starts_from:] translated with start_bytes, a chunk at a time
+        starts = b''
+        starts_from = 0
+        while i < n:
+            if threads.idle:
+                # jump to the next byte that can begin a match
+                while i < n:
+                    if i >= starts_from + len(starts):
+                        starts_from = i
+                        starts = data[i:i + self.chunk_size].translate(self.start_bytes)
+                    j = starts.find(1, i - starts_from)
+                    if j != -1:
+                        i = starts_from + j
+                        break
+                    i = starts_from + len(starts)
+                else:
+                    break
+            if len(threads.threads) == 1 and not (start_bytes[data[i]] and threads.threads[0][0] != start_state):
+                i = self.run_alone(data, i, n, base, threads)
+            else:
+                threads.step(byte_classes[data[i]], base + i)
+                i += 1
+            best = threads.pop_match()
+            while best is not None:
+                yield best
+                best = threads.pop_match()
+        if final:
+            yield from threads.finish()
+
+    def run_alone(self, data, i: int, n: int, base: int, threads: MatchThreads) -> int:
+        """
+        Moves the only live attempt of threads from data[i] until it dies or a new attempt can start,
+        returns where it stopped
+        """
+        table, k, accepting = self.matcher.table, self.matcher.num_classes, self.matcher.accepting
+        byte_classes, start_bytes, start_state = self.byte_classes, self.start_bytes, self.matcher.start
+        s, begin, level = threads.threads[0]
+        levels, index = threads.levels, level - threads.first_level
+        while True:
+            s = table[s * k + byte_classes[data[i]]]
+            i += 1
+            if s == DEAD:
+                threads.threads, threads.states = [], set()
+                return i
+            if accepting[s]:
+                # same as a match in `MatchThreads.step`
+                if len(levels) != index + 2:
+                    del levels[index + 1:]
+                    levels.append(None)
+                levels[index] = (begin, base + i)
+            if i >= n or (start_bytes[data[i]] and s != start_state):
+                threads.threads, threads.states = [(s, begin, level)], {s}
+                return i
+
+    def scan_bytes(self, data) -> Iterator[tuple[int, int]]:
+        """
+        Scans data that is fully addressable like bytes or an mmap, nothing is copied
+        """
+        yield from self.scan(data, MatchThreads(self.matcher), True)
+
+    def scan_stream(self, stream: BinaryIO) -> Iterator[tuple[int, int]]:
+        """
+        Scans a binary stream chunk by chunk, no chunk is kept once it is scanned
+        """
+        # offset of the next chunk in the stream
+        base = 0
+        threads = MatchThreads(self.matcher)
+        while True:
+            chunk = stream.read(self.chunk_size)
+            final = not chunk
+            yield from self.scan(chunk, threads, final, base)
+            if final:
+                return
+            base += len(chunk)
+
+    def scan_file(self, path: str) -> Iterator[tuple[int, int]]:
+        """
+        Scans a file through mmap, or chunk by chunk if it can't be mapped
+        """
+        with open(path, 'rb') as file:
+            try:
+                data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                # empty files and special files can't be mapped
+                yield from self.scan_stream(file)
+                return
+            with data:
+                yield from self.scan_bytes(data)
@@ -0,0 +1,102 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import automaton_cache
+from automaton_cache import AutomatonCache, compile_matcher
+from test_automaton_format import same_matcher
+
+
+class AutomatonCacheTest(unittest.TestCase):
+    """
+    The in-process LRU, the files on disk, their atomic writes and the keys that invalidate them
+    """
+
+    def counting_compiler(self):
+        calls = []
+
+        def compiler(pattern):
+            calls.append(pattern)
+            return compile_matcher(pattern)
+        return compiler, calls
+
+    def test_lru(self):
+        compiler, calls = self.counting_compiler()
+        cache = AutomatonCache(max_entries=2, compiler=compiler)
+        a = cache.get('a+')
+        cache.get('b+')
+        self.assertIs(cache.get('a+'), a)
+        # b+ is the least recently used one
+        cache.get('c+')
+        cache.get('a+')
+        cache.get('b+')
+        self.assertEqual(calls, ['a+', 'b+', 'c+', 'b+'])
+        self.assertEqual(cache.stats(), {"entries": 2, "hits": 2, "diskHits": 0, "misses": 4, "evictions": 2,
+                                         "corrupted": 0})
+
+    def test_directory(self):
+        with tempfile.TemporaryDirectory() as directory:
+            compiler, calls = self.counting_compiler()
+            first = AutomatonCache(directory=directory, compiler=compiler)
+            matcher = first.get('(a|b)*abb')
+            self.assertEqual(os.listdir(directory), [f"{first.key('(a|b)*abb')}.rtxa"])
+
+            # a new process finds the file, a cleared cache too
+            second = AutomatonCache(directory=directory, compiler=compiler)
+            loaded = second.get('(a|b)*abb')
+            self.assertTrue(same_matcher(matcher, loaded))
+            second.clear()
+            second.get('(a|b)*abb')
+            self.assertEqual(calls, ['(a|b)*abb'])
+            self.assertEqual(second.disk_hits, 2)
+            del loaded
+
+    def test_corrupted(self):
+        with tempfile.TemporaryDirectory() as directory:
+            compiler, calls = self.counting_compiler()
+            cache = AutomatonCache(directory=directory, compiler=compiler)
+            path = cache.path(cache.key('ab*'))
+            cache.get('ab*')
+            with open(path, 'r+b') as file:
+                file.seek(-1, os.SEEK_END)
+                byte = file.read(1)
+                file.seek(-1, os.SEEK_END)
+                file.write(bytes([byte[0] ^ 1]))
+            cache.clear()
+            self.assertTrue(cache.get('ab*').fullmatch('abbb'))
+            self.assertEqual((cache.corrupted, len(calls)), (1, 2))
+            # the file was written again
+            cache.clear()
+            cache.get('ab*')
+            self.assertEqual((cache.corrupted, cache.disk_hits, len(calls)), (1, 1, 2))
+
+    def test_atomic_write(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = AutomatonCache(directory=directory)
+            cache.get('a')
+            path = cache.path(cache.key('a'))
+            with open(path, 'rb') as file:
+                before = file.read()
+            # a write that fails before the rename leaves the old file and no temporary one
+            with mock.patch.object(os, 'replace', side_effect=OSError('disk full')):
+                with self.assertRaises(OSError):
+                    cache.store(cache.key('a'), compile_matcher('b'))
+            self.assertEqual(os.listdir(directory), [os.path.basename(path)])
+            with open(path, 'rb') as file:
+                self.assertEqual(file.read(), before)
+
+    def test_invalidation(self):
+        with tempfile.TemporaryDirectory() as directory:
+            compiler, calls = self.counting_compiler()
+            AutomatonCache(directory=directory, compiler=compiler).get('a|b')
+            # another namespace or compiler version doesn't see the file
+            AutomatonCache(directory=directory, compiler=compiler, namespace='other').get('a|b')
+            with mock.patch.object(automaton_cache, 'COMPILER_VERSION', '2'):
+                AutomatonCache(directory=directory, compiler=compiler).get('a|b')
+            AutomatonCache(directory=directory, compiler=compiler).get('a|b')
+            self.assertEqual(calls, ['a|b'] * 3)
+            self.assertEqual(len(os.listdir(directory)), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
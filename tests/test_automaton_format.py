@@ -0,0 +1,74 @@
+import os
+import random
+import re
+import struct
+import tempfile
+import unittest
+import automaton_format
+from compiler import compile
+from matcher import DFAMatcher
+from test_matcher import PATTERNS
+from tokenizer import Tokenizer
+
+
+def same_matcher(a: DFAMatcher, b: DFAMatcher) -> bool:
+    return (a.alphabet.labels == b.alphabet.labels and a.num_states == b.num_states and a.start == b.start
+            and list(a.table) == list(b.table) and bytes(a.accepting) == bytes(b.accepting)
+            and (None if a.tags is None else list(a.tags)) == (None if b.tags is None else list(b.tags)))
+
+
+class AutomatonFormatTest(unittest.TestCase):
+    """
+    RTXA files have to give back the same tables, with the tags of merged patterns, and reject damaged files
+    """
+
+    def test_round_trip(self):
+        rnd = random.Random(14)
+        with tempfile.TemporaryDirectory() as directory:
+            for i, pattern in enumerate(PATTERNS):
+                matcher = compile(pattern).matcher
+                path = os.path.join(directory, f'{i}.rtxa')
+                matcher.save(path)
+                with self.subTest(pattern=pattern):
+                    loaded = DFAMatcher.load(path)
+                    self.assertTrue(same_matcher(matcher, loaded))
+                    self.assertIsNone(loaded.tags)
+                    self.assertTrue(same_matcher(matcher, automaton_format.from_buffer(automaton_format.to_bytes(matcher))))
+                    for _ in range(100):
+                        text = ''.join(rnd.choice('abcdxyz09') for _ in range(rnd.randint(0, 12)))
+                        self.assertEqual(loaded.fullmatch(text), re.fullmatch(pattern, text) is not None, text)
+                del loaded
+
+    def test_tags(self):
+        tokenizer = Tokenizer(['if', '[a-z]+', '[0-9]+'])
+        data = automaton_format.to_bytes(tokenizer.matcher)
+        flags = struct.unpack_from('<H', data, 6)[0]
+        self.assertTrue(flags & automaton_format.FLAG_TAGS)
+        loaded = automaton_format.from_buffer(data)
+        self.assertTrue(same_matcher(tokenizer.matcher, loaded))
+        tokenizer.matcher = loaded
+        self.assertEqual(list(tokenizer.tokenize('if12iff')), [(0, 0, 2), (2, 2, 4), (1, 4, 7)])
+
+    def test_corrupted(self):
+        data = automaton_format.to_bytes(compile('(a|b)*abb').matcher)
+        # the version and every field covered by the checksum, then the labels, the table and the bitmap
+        for offset in [4, 8, 12, 16, 20, automaton_format.HEADER.size, len(data) - 1]:
+            damaged = bytearray(data)
+            damaged[offset] ^= 1
+            with self.subTest(offset=offset):
+                with self.assertRaises(Exception):
+                    automaton_format.from_buffer(bytes(damaged))
+        with self.assertRaises(Exception):
+            automaton_format.from_buffer(b'XXXX' + data[4:])
+        for size in [0, automaton_format.HEADER.size - 1, len(data) - 1]:
+            with self.subTest(size=size):
+                with self.assertRaises(Exception):
+                    automaton_format.from_buffer(data[:size], verify=False)
+
+    def test_version(self):
+        data = automaton_format.to_bytes(compile('a').matcher)
+        self.assertEqual(struct.unpack_from('<H', data, 4)[0], automaton_format.VERSION)
+
+
+if __name__ == '__main__':
+    unittest.main()
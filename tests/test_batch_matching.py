@@ -0,0 +1,45 @@
+import random
+import unittest
+import numpy as np
+from compiler import compile
+
+PATTERNS = ['[a-z][a-z0-9]*', '(a|b)*abb', 'a*b+c?', '.b', '(aa|aaa)*', '[0-9]+(a|[b-d])*']
+
+
+class BatchMatchingTest(unittest.TestCase):
+    """
+    fullmatch_many has to give the answers of fullmatch and match string by string
+    """
+
+    def check(self, matcher, texts, **options):
+        matched, lengths = matcher.fullmatch_many(texts, return_lengths=True, **options)
+        self.assertEqual(matched.tolist(), [matcher.fullmatch(text) for text in texts])
+        self.assertEqual(lengths.tolist(), [-1 if (end := matcher.match(text)) is None else end for text in texts])
+        self.assertEqual(matcher.fullmatch_many(texts, **options).tolist(), matched.tolist())
+
+    def test_against_fullmatch(self):
+        rnd = random.Random(17)
+        # é and 中 are past the lookup table of the classes, \x00 has to stay when it ends a string
+        alphabet = 'abcdz09é中\x00'
+        texts = [''.join(rnd.choice(alphabet) for _ in range(rnd.randint(0, 12))) for _ in range(500)]
+        texts += ['', 'a' * 300, 'ab' * 200 + 'b', 'abb\x00']
+        for pattern in PATTERNS:
+            matcher = compile(pattern).matcher
+            with self.subTest(pattern=pattern):
+                self.check(matcher, texts)
+                # small batches, no rows finished one at a time and every row finished one at a time
+                self.check(matcher, texts, batch_size=7, scalar_rows=0)
+                self.check(matcher, texts, scalar_rows=10 ** 6)
+
+    def test_numpy_input(self):
+        matcher = compile('(a|b)*abb').matcher
+        texts = ['abb', 'aabb', 'ab', '', 'babb', 'b' * 100 + 'abb']
+        self.assertEqual(matcher.fullmatch_many(np.array(texts)).tolist(), [True, True, False, False, True, True])
+
+    def test_empty(self):
+        matcher = compile('a').matcher
+        self.assertEqual(matcher.fullmatch_many([]).tolist(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
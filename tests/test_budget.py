@@ -0,0 +1,57 @@
+import random
+import re
+import unittest
+from budget import BudgetExceeded, CompileBudget
+from compile_stats import CompileStats
+from compiler import NFA_ENGINE, compile
+from dfa_generator import dfa_generator
+from direct_dfa import DirectDFA
+from reg_parser import RegParser
+
+PATTERN = '(a|b)*a(a|b)(a|b)'
+
+
+class BudgetTest(unittest.TestCase):
+    """
+    A DFA going over its budget stops the construction, compile then falls back to simulating the NFA
+    """
+
+    def test_constructions_raise(self):
+        with self.assertRaises(BudgetExceeded) as raised:
+            dfa_generator(nfa=RegParser(PATTERN).parse_compact(), budget=CompileBudget(max_states=3)).convert_to_dfa()
+        self.assertEqual(raised.exception.resource, 'states')
+        with self.assertRaises(BudgetExceeded):
+            DirectDFA(RegParser(PATTERN), budget=CompileBudget(max_states=3)).convert_to_dfa()
+        with self.assertRaises(BudgetExceeded):
+            DirectDFA(RegParser(PATTERN), budget=CompileBudget(max_transitions=2)).convert_to_dfa()
+
+    def test_fallback(self):
+        rnd = random.Random(3)
+        texts = [''.join(rnd.choice('abc') for _ in range(rnd.randint(0, 8))) for _ in range(300)]
+        for construction in RegParser.constructions + ['direct']:
+            with self.subTest(construction=construction):
+                compiled = compile(PATTERN, budget=CompileBudget(max_states=3), construction=construction)
+                self.assertEqual(compiled.matcher_engine, NFA_ENGINE)
+                self.assertIsNone(compiled.dfa)
+                self.assertIsInstance(compiled.budget_error, BudgetExceeded)
+                for text in texts:
+                    self.assertEqual(compiled.fullmatch(text), re.fullmatch(PATTERN, text) is not None, text)
+
+    def test_aborted_stage(self):
+        for construction, name in (('thompson', 'subset'), ('direct', 'direct')):
+            with self.subTest(construction=construction):
+                hooked = []
+                stats = CompileStats(hook=lambda stats, stage: hooked.append(stage.name))
+                compile(PATTERN, budget=CompileBudget(max_states=3), construction=construction, stats=stats)
+                stage = stats.get(name)
+                self.assertIsNotNone(stage)
+                self.assertIn(name, hooked)
+                self.assertEqual(stage.counts['aborted'], 1)
+                # the states built when the budget ran out
+                self.assertEqual(stage.counts['states'], 4)
+                self.assertIn('BudgetExceeded', stage.error)
+                self.assertEqual(hooked[-1], 'nfa_matcher')
+
+
+if __name__ == '__main__':
+    unittest.main()
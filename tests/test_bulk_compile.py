@@ -0,0 +1,57 @@
+import multiprocessing
+import os
+import unittest
+import bulk_compile
+
+CRASHING_PATTERN = 'x(y|z)*crash'
+
+
+def compile_or_crash(pattern: str, engine: str):
+    """
+    Kills the worker process on CRASHING_PATTERN, compiles everything else
+    """
+    if pattern == CRASHING_PATTERN:
+        os._exit(1)
+    return bulk_compile.compile_matcher(pattern, engine)
+
+
+class BulkCompileTest(unittest.TestCase):
+    """
+    A worker that dies must only fail its own pattern, every other pattern still gets its result
+    the crash comes from the compiler sent to the workers, so it happens with every start method
+    """
+
+    def check(self, patterns: list[str], crashing: set[int], **options):
+        done = []
+        results = bulk_compile.bulk_compile(patterns, workers=2, compiler=compile_or_crash,
+                                            progress=lambda count, total, result: done.append(count), **options)
+        self.assertNotIn(None, results)
+        self.assertEqual([r.index for r in results], list(range(len(patterns))))
+        self.assertEqual({i for i, r in enumerate(results) if not r.ok}, crashing)
+        self.assertEqual(done, list(range(1, len(patterns) + 1)))
+        for i, r in enumerate(results):
+            if r.ok:
+                self.assertTrue(r.get_matcher().fullmatch(f'abc{i}'), r)
+
+    def test_worker_crash(self):
+        for method in ['fork', 'spawn']:
+            if method not in multiprocessing.get_all_start_methods():
+                continue
+            with self.subTest(mp_context=method):
+                patterns = [f'(a|b)*c{i}' for i in range(81)]
+                patterns[42] = CRASHING_PATTERN
+                self.check(patterns, {42}, batch_size=4, mp_context=method)
+
+    def test_crash_while_submitting(self):
+        # batches of one pattern, the pool breaks while most of them are still waiting to be submitted
+        patterns = [f'(a|b)*c{i}' for i in range(40)]
+        patterns[1] = patterns[30] = CRASHING_PATTERN
+        self.check(patterns, {1, 30}, batch_size=1, mp_context='spawn')
+
+    def test_in_process(self):
+        results = bulk_compile.bulk_compile(['a+', '(a', 'b'], workers=0)
+        self.assertEqual([r.ok for r in results], [True, False, True])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import random
+import unittest
+from codegen import GeneratedMatcher, RUN_WINDOW, generate_source, has_run, load_source
+from compiler import compile
+
+PATTERNS = [
+    'a',
+    '[a-z][a-z0-9]*',
+    # runs of the other class, stopped with str.find
+    '.*a',
+    'a.*b',
+    '(.|a)*',
+    # a state whose only branch takes every character ('if True:' or a complete 'else:')
+    'a.b',
+    '(ab|.c)d',
+    'x(y|z)+.',
+    '(a|b)*a(a|b)(a|b)',
+    '[0-9]+(a|[b-d])*e?',
+    '((a*b)*c)*',
+]
+
+ALPHABET = 'abcdexyz09#Z'
+
+
+def random_texts(rnd: random.Random, count: int) -> list[str]:
+    """
+    Short random texts and long runs of one or two characters, longer than the windows of `codegen.write_run`
+    """
+    texts = [''.join(rnd.choice(ALPHABET) for _ in range(rnd.randint(0, 10))) for _ in range(count)]
+    for _ in range(count // 4):
+        run = ''.join(rnd.choice(ALPHABET) for _ in range(rnd.randint(1, 2))) * rnd.randint(1, 3 * RUN_WINDOW)
+        texts.append(rnd.choice(ALPHABET[:4]) + run + ''.join(rnd.choice(ALPHABET) for _ in range(rnd.randint(0, 2))))
+    return texts
+
+
+class CodegenTest(unittest.TestCase):
+    """
+    The generated functions have to agree with the table of `DFAMatcher` on every input
+    """
+
+    def test_generated_source(self):
+        rnd = random.Random(7)
+        for pattern in PATTERNS:
+            matcher = compile(pattern).matcher
+            namespace = load_source(generate_source(matcher))
+            with self.subTest(pattern=pattern):
+                for text in random_texts(rnd, 400):
+                    self.assertEqual(namespace['fullmatch'](text), matcher.fullmatch(text), text)
+                    pos = rnd.randint(0, len(text))
+                    self.assertEqual(namespace['match'](text, pos), matcher.match(text, pos), (text, pos))
+
+    def test_table_fallback(self):
+        # without self loop runs the table functions are kept
+        matcher = compile('[a-c]x[d-f]y[0-9]').matcher
+        self.assertFalse(any(has_run(matcher, s) for s in range(matcher.num_states)))
+        generated = GeneratedMatcher(matcher)
+        self.assertIsNone(generated.source)
+        self.assertTrue(generated.fullmatch('axdy5'))
+        self.assertEqual(generated.match('bxey7!'), 5)
+
+        generated = GeneratedMatcher(compile('[a-z][a-z0-9]*').matcher)
+        self.assertIsNotNone(generated.source)
+        self.assertEqual(generated.match('ab12 c'), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import random
+import re
+import unittest
+from compact_nfa import CompactNFA
+from dfa_generator import AutomataMachine
+from lazy_dfa import NFASimulator
+from reg_parser import RegParser
+
+PATTERNS = ['a', 'ab|c', '(a|b)*abb', 'a*b+c?', '(ab|a)(bc|c)*', '[a-c]+d.', '((a*b)*c)*', 'a?a?a?aaa', '(a*)*b',
+            'x(y|z)+', '[0-9]+(a|[b-d])*']
+
+
+def renumber(nfa: dict) -> dict:
+    """
+    `State` ids of `RegParser.parse` keep counting across parses, the json is renumbered from S0
+    """
+    base = min(int(name[1:]) for name in nfa if name != 'startingState')
+
+    def name(state: str) -> str:
+        return f'S{int(state[1:]) - base}'
+
+    ret = {'startingState': name(nfa['startingState'])}
+    for state, value in nfa.items():
+        if state != 'startingState':
+            ret[name(state)] = {k: v if k == 'isTerminatingState' else [name(t) for t in v] if isinstance(v, list) else name(v)
+                                for k, v in value.items()}
+    return ret
+
+
+def random_texts(rnd: random.Random, count: int) -> list[str]:
+    return [''.join(rnd.choice('abcdxyz09') for _ in range(rnd.randint(0, 8))) for _ in range(count)]
+
+
+class CompactNFATest(unittest.TestCase):
+    """
+    The array backed Thompson NFA has to be the NFA of `RegParser.parse` and match like `re`
+    """
+
+    def test_same_as_parse(self):
+        for pattern in PATTERNS:
+            with self.subTest(pattern=pattern):
+                self.assertEqual(renumber(RegParser(pattern).parse_compact().to_json()), renumber(RegParser(pattern).parse()))
+
+    def test_against_re(self):
+        rnd = random.Random(5)
+        for pattern in PATTERNS:
+            machine = AutomataMachine()
+            machine.states = machine.load_dict(RegParser(pattern).parse())
+            nfas = [RegParser(pattern).parse_compact(), CompactNFA.from_automata(machine)]
+            with self.subTest(pattern=pattern):
+                simulators = [NFASimulator(nfa) for nfa in nfas]
+                for text in random_texts(rnd, 300):
+                    expected = re.fullmatch(pattern, text) is not None
+                    for simulator in simulators:
+                        self.assertEqual(simulator.fullmatch(text), expected, text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import random
+import re
+import unittest
+from compiler import compile
+from test_matcher import PATTERNS, leftmost_longest, longest_match
+
+
+class DirectDFATest(unittest.TestCase):
+    """
+    The followpos DFA against `re` and against the DFAs built from the NFAs
+    """
+
+    def test_against_re(self):
+        rnd = random.Random(25)
+        for pattern in PATTERNS:
+            expected = re.compile(pattern)
+            matcher = compile(pattern, construction='direct').matcher
+            with self.subTest(pattern=pattern):
+                for _ in range(200):
+                    text = ''.join(rnd.choice('abcdxyz09') for _ in range(rnd.randint(0, 12)))
+                    pos = rnd.randint(0, len(text))
+                    self.assertEqual(matcher.fullmatch(text), expected.fullmatch(text) is not None, text)
+                    self.assertEqual(matcher.match(text, pos), longest_match(expected, text, pos), (text, pos))
+                    self.assertEqual(matcher.search(text, pos), leftmost_longest(expected, text, pos), (text, pos))
+
+    def test_same_minimal_dfa(self):
+        # the minimal DFA is unique, so every construction ends with the same number of states
+        for pattern in PATTERNS:
+            with self.subTest(pattern=pattern):
+                sizes = {construction: compile(pattern, construction=construction).matcher.num_states
+                         for construction in ['thompson', 'glushkov', 'direct']}
+                self.assertEqual(len(set(sizes.values())), 1, sizes)
+
+
+if __name__ == '__main__':
+    unittest.main()
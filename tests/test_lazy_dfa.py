@@ -0,0 +1,60 @@
+import random
+import re
+import unittest
+from lazy_dfa import LazyDFA
+from reg_parser import RegParser
+from test_matcher import PATTERNS, leftmost_longest, longest_match
+
+
+class LazyDFATest(unittest.TestCase):
+    """
+    The lazy DFA against `re`, with a cache big enough to never flush, one that flushes all the time
+    and one that thrashes and falls back to the NFA state sets
+    """
+
+    def check(self, lazy: LazyDFA, pattern: str, seed: int):
+        rnd = random.Random(seed)
+        expected = re.compile(pattern)
+        for _ in range(200):
+            text = ''.join(rnd.choice('abcdxyz09') for _ in range(rnd.randint(0, 16)))
+            pos = rnd.randint(0, len(text))
+            self.assertEqual(lazy.fullmatch(text), expected.fullmatch(text) is not None, text)
+            self.assertEqual(lazy.match(text, pos), longest_match(expected, text, pos), (text, pos))
+            self.assertEqual(lazy.search(text, pos), leftmost_longest(expected, text, pos), (text, pos))
+            self.assertLessEqual(lazy.num_cached_states, lazy.max_states)
+
+    def test_against_re(self):
+        for pattern in PATTERNS:
+            with self.subTest(pattern=pattern):
+                lazy = LazyDFA(RegParser(pattern).parse_compact())
+                self.check(lazy, pattern, 9)
+                self.assertEqual(lazy.num_flushes, 0)
+
+    def test_flushes(self):
+        flushes = fallbacks = 0
+        for pattern in PATTERNS:
+            with self.subTest(pattern=pattern):
+                # max_flushes is never reached by texts of 16 characters
+                lazy = LazyDFA(RegParser(pattern).parse_compact(), max_states=2, max_flushes=100)
+                self.check(lazy, pattern, 10)
+                flushes += lazy.num_flushes
+                fallbacks += lazy.num_fallbacks
+        self.assertGreater(flushes, 0)
+        self.assertEqual(fallbacks, 0)
+
+    def test_fallback(self):
+        fallbacks = 0
+        for pattern in PATTERNS:
+            with self.subTest(pattern=pattern):
+                lazy = LazyDFA(RegParser(pattern).parse_compact(), max_states=2, max_flushes=0)
+                self.check(lazy, pattern, 11)
+                fallbacks += lazy.num_fallbacks
+        self.assertGreater(fallbacks, 0)
+
+    def test_max_states(self):
+        with self.assertRaises(Exception):
+            LazyDFA(RegParser('a').parse_compact(), max_states=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import random
+import re
+import unittest
+from typing import Optional
+from compiler import compile
+
+PATTERNS = ['a', 'ab|c', '(a|b)*abb', 'a*b+c?', '(ab|a)(bc|c)*', '[a-c]+d.', '((a*b)*c)*', '(a|b)*a(a|b)(a|b)',
+            'a?a?a?aaa', 'x(y|z)+', '[0-9]+(a|[b-d])*', '(aa|aaa)*', 'a*', '.b']
+
+
+def longest_match(pattern: re.Pattern, text: str, pos: int) -> Optional[int]:
+    for end in range(len(text), pos - 1, -1):
+        if pattern.fullmatch(text, pos, end):
+            return end
+    return None
+
+
+def leftmost_longest(pattern: re.Pattern, text: str, pos: int) -> Optional[tuple[int, int]]:
+    for start in range(pos, len(text) + 1):
+        end = longest_match(pattern, text, start)
+        if end is not None:
+            return start, end
+    return None
+
+
+class MatcherTest(unittest.TestCase):
+    """
+    The table driven matcher against `re` used by brute force for the leftmost longest semantics
+    """
+
+    def test_against_re(self):
+        rnd = random.Random(13)
+        for pattern in PATTERNS:
+            expected = re.compile(pattern)
+            matcher = compile(pattern).matcher
+            with self.subTest(pattern=pattern):
+                for _ in range(200):
+                    text = ''.join(rnd.choice('abcdxyz09') for _ in range(rnd.randint(0, 12)))
+                    pos = rnd.randint(0, len(text))
+                    self.assertEqual(matcher.fullmatch(text), expected.fullmatch(text) is not None, text)
+                    self.assertEqual(matcher.match(text, pos), longest_match(expected, text, pos), (text, pos))
+                    self.assertEqual(matcher.search(text, pos), leftmost_longest(expected, text, pos), (text, pos))
+
+
+if __name__ == '__main__':
+    unittest.main()
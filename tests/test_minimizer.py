@@ -0,0 +1,63 @@
+import random
+import re
+import unittest
+from benchmarks.patterns import GENERATORS, SIZES
+from compact_nfa import CompactNFA
+from dfa_generator import DFA_Minimizer, dfa_generator
+from matcher import DFAMatcher
+from reg_parser import RegParser
+
+PATTERNS = ['a', 'ab|c', '(a|b)*abb', 'a*b+c?', '(ab|a)(bc|c)*', '[a-c]+d.', '((a*b)*c)*', '(a|b)*a(a|b)(a|b)',
+            'a?a?a?aaa', '(a*)*b', 'x(y|z)+', '[0-9]+(a|[b-d])*', '(aa|aaa)*']
+
+
+def minimized(nfa: CompactNFA, engine: str) -> DFAMatcher:
+    minimizer = DFA_Minimizer(dfa_generator(nfa=nfa).convert_to_dfa(), engine)
+    minimizer.minimize()
+    return DFAMatcher.from_automata(minimizer.reconstruct_dfa())
+
+
+class MinimizerTest(unittest.TestCase):
+    """
+    Hopcroft has to find the same minimal DFA as the Moore refinement, and both have to match like `re`
+    """
+
+    def test_against_moore(self):
+        rnd = random.Random(9)
+        for pattern in PATTERNS:
+            nfa = RegParser(pattern).parse_compact()
+            moore, hopcroft = minimized(nfa, 'moore'), minimized(nfa, 'hopcroft')
+            with self.subTest(pattern=pattern):
+                self.assertEqual(hopcroft.num_states, moore.num_states)
+                for _ in range(300):
+                    text = ''.join(rnd.choice('abcdxyz09') for _ in range(rnd.randint(0, 8)))
+                    expected = re.fullmatch(pattern, text) is not None
+                    self.assertEqual(hopcroft.fullmatch(text), expected, text)
+                    self.assertEqual(moore.fullmatch(text), expected, text)
+
+    def test_generated_patterns(self):
+        for name, sizes in SIZES['quick'].items():
+            nfa = RegParser(GENERATORS[name](sizes[0])).parse_compact()
+            with self.subTest(generator=name):
+                self.assertEqual(minimized(nfa, 'hopcroft').num_states, minimized(nfa, 'moore').num_states)
+
+    def test_exponential_size(self):
+        # (a|b)*a(a|b){n} needs 2^(n+1) states
+        for n in range(4):
+            nfa = RegParser(GENERATORS['exponential'](n)).parse_compact()
+            self.assertEqual(minimized(nfa, 'hopcroft').num_states, 2 ** (n + 1))
+
+    def test_tags_kept_apart(self):
+        # states accepting different rules can't be merged even if they behave the same after
+        nfa = CompactNFA.union([RegParser(rule).parse_compact() for rule in ['a', 'b', '[ab]c']])
+        moore, hopcroft = minimized(nfa, 'moore'), minimized(nfa, 'hopcroft')
+        self.assertEqual(hopcroft.num_states, moore.num_states)
+        for text, rule in (('a', 0), ('b', 1), ('ac', 2), ('bc', 2)):
+            state = hopcroft.start
+            for ch in text:
+                state = hopcroft.next_state(state, ch)
+            self.assertEqual(hopcroft.tags[state], rule)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+from unittest import mock
+import dfa_generator as dfa_generator_module
+from benchmarks.patterns import GENERATORS, SIZES
+from compact_nfa import CompactNFA
+from compile_stats import CompileStats
+from dfa_generator import AutomataMachine, dfa_generator
+from reg_parser import RegParser
+
+
+def same_dfa(a: AutomataMachine, b: AutomataMachine) -> bool:
+    """
+    True if the two DFAs have the same state numbers, start, terminating states, tags and transitions
+    """
+    if a.starting_state != b.starting_state or a.states.keys() != b.states.keys():
+        return False
+    return all(x.is_terminating_state == y.is_terminating_state and x.tag == y.tag and x.transitions == y.transitions
+               for x, y in ((a.states[s], b.states[s]) for s in a.states))
+
+
+class ParallelSubsetsTest(unittest.TestCase):
+    """
+    The subset construction with a pool of workers has to build the same DFA as with one, numbering included
+    """
+
+    def check(self, nfa: CompactNFA, batch_size: int, min_frontier: int = 1) -> dict[str, int]:
+        serial = dfa_generator(nfa=nfa).convert_to_dfa()
+        stats = CompileStats()
+        parallel = dfa_generator(nfa=nfa, stats=stats).convert_to_dfa(2, batch_size, min_frontier)
+        self.assertTrue(same_dfa(serial, parallel))
+        return stats.get('subset').counts
+
+    def test_generated_patterns(self):
+        for name, sizes in SIZES['quick'].items():
+            pattern = GENERATORS[name](sizes[0])
+            for construction in RegParser.constructions:
+                with self.subTest(generator=name, construction=construction):
+                    self.assertGreater(self.check(RegParser(pattern).parse_compact(construction), 1)['parallel_levels'], 0)
+
+    def test_batch_sizes(self):
+        nfa = RegParser('(a|b)*a(a|b)(a|b)(a|b)(a|b)').parse_compact()
+        for batch_size in (1, 3, 256):
+            with self.subTest(batch_size=batch_size):
+                self.check(nfa, batch_size)
+
+    def test_tagged_rules(self):
+        nfa = CompactNFA.union([RegParser(rule).parse_compact() for rule in ['if', '[a-z]+', '[0-9]+', '(a|i)f*']])
+        self.check(nfa, 1)
+
+    def test_small_frontiers(self):
+        # no level reaches the default min_frontier, the pool is never started
+        nfa = RegParser('(a|b)*a(a|b)(a|b)(a|b)(a|b)').parse_compact()
+        with mock.patch.object(dfa_generator_module, 'ProcessPoolExecutor', side_effect=AssertionError('pool started')):
+            self.assertEqual(self.check(nfa, 1, 4096)['parallel_levels'], 0)
+
+    def test_mixed_levels(self):
+        # the levels of (a|b)*a(a|b){n} double, the first ones stay serial
+        nfa = RegParser('(a|b)*a(a|b)(a|b)(a|b)(a|b)(a|b)(a|b)').parse_compact()
+        levels = self.check(nfa, 4, 1)['parallel_levels']
+        self.assertTrue(0 < self.check(nfa, 4, 16)['parallel_levels'] < levels)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import io
+import os
+import random
+import re
+import tempfile
+import unittest
+from compiler import compile
+from stream_search import StreamScanner
+from test_matcher import longest_match
+
+PATTERNS = ['ab|c', '(a|b)*abb', 'a*b+c?', '(ab|a)(bc|c)*', 'x(y|z)+', '[0-9]+(a|[b-d])*', '(aa|aaa)*', 'a*', '.b',
+            '(a|b)*a(a|b)(a|b)']
+
+
+def expected_matches(pattern: re.Pattern, text: str) -> list[tuple[int, int]]:
+    """
+    The leftmost longest non empty matches one after the other, by brute force
+    """
+    matches = []
+    start = 0
+    while start < len(text):
+        end = longest_match(pattern, text, start)
+        if end is not None and end > start:
+            matches.append((start, end))
+            start = end
+        else:
+            start += 1
+    return matches
+
+
+class StreamScannerTest(unittest.TestCase):
+    """
+    The matches of the scanner must not depend on where the chunks split the input
+    """
+
+    def test_chunks(self):
+        rnd = random.Random(11)
+        for pattern in PATTERNS:
+            expected = re.compile(pattern)
+            matcher = compile(pattern).matcher
+            with self.subTest(pattern=pattern):
+                for _ in range(60):
+                    # \xe9 and \xff are only matched by .
+                    text = ''.join(rnd.choice('aabbcxyz09\xe9\xff') for _ in range(rnd.randint(0, 30)))
+                    data = text.encode('latin-1')
+                    matches = expected_matches(expected, text)
+                    self.assertEqual(list(StreamScanner(matcher).scan_bytes(data)), matches, text)
+                    for chunk_size in [1, 2, 3, 7]:
+                        scanner = StreamScanner(matcher, chunk_size)
+                        self.assertEqual(list(scanner.scan_stream(io.BytesIO(data))), matches, (text, chunk_size))
+                        self.assertEqual(list(scanner.scan_bytes(data)), matches, (text, chunk_size))
+
+    def test_long_match_across_chunks(self):
+        matcher = compile('a(a|b)*c').matcher
+        data = b'x' * 5 + b'a' + b'ab' * 500 + b'c' + b'x' * 5 + b'ac'
+        expected = [(5, 1007), (1012, 1014)]
+        for chunk_size in [1, 4, 64, 1 << 20]:
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(list(StreamScanner(matcher, chunk_size).scan_stream(io.BytesIO(data))), expected)
+
+    def test_file(self):
+        matcher = compile('(a|b)*abb').matcher
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'data')
+            with open(path, 'wb') as file:
+                file.write(b'xxabbaabbxabb')
+            self.assertEqual(list(StreamScanner(matcher).scan_file(path)), [(2, 9), (10, 13)])
+            empty = os.path.join(directory, 'empty')
+            open(empty, 'wb').close()
+            self.assertEqual(list(StreamScanner(matcher).scan_file(empty)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
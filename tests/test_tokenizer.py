@@ -0,0 +1,60 @@
+import random
+import re
+import unittest
+from test_matcher import longest_match
+from tokenizer import Tokenizer
+
+RULE_SETS = [
+    ['if', '[a-z]+', '[0-9]+'],
+    ['[a-z]+', 'if', '[0-9]+'],
+    ['i', 'if', 'iff', '(i|f)*', '[a-z]'],
+    ['a*b', 'ab*', '(ab)+', 'a|b'],
+    ['x[0-9]*', '[a-z][a-z0-9]*', '0x[0-9a-f]+', '[0-9]+'],
+]
+
+
+def expected_token(rules: list[re.Pattern], text: str, pos: int):
+    """
+    The longest non empty match of any rule at pos, the first rule wins a tie
+    """
+    best = None
+    for i, rule in enumerate(rules):
+        end = longest_match(rule, text, pos)
+        if end is not None and end > pos and (best is None or end > best[1]):
+            best = (i, end)
+    return best
+
+
+class TokenizerTest(unittest.TestCase):
+    """
+    Maximal munch first, then the order of the rules, against `re` tried rule by rule
+    """
+
+    def test_against_re(self):
+        rnd = random.Random(12)
+        for rules in RULE_SETS:
+            tokenizer = Tokenizer(rules)
+            patterns = [re.compile(rule) for rule in rules]
+            with self.subTest(rules=rules):
+                for _ in range(200):
+                    text = ''.join(rnd.choice('abfix09') for _ in range(rnd.randint(1, 10)))
+                    pos = rnd.randint(0, len(text) - 1)
+                    self.assertEqual(tokenizer.next_token(text, pos), expected_token(patterns, text, pos), (text, pos))
+
+    def test_priority(self):
+        self.assertEqual(list(Tokenizer(['if', '[a-z]+']).tokenize('if')), [(0, 0, 2)])
+        self.assertEqual(list(Tokenizer(['[a-z]+', 'if']).tokenize('if')), [(0, 0, 2)])
+        # the longer token wins over the earlier rule
+        self.assertEqual(list(Tokenizer(['if', '[a-z]+']).tokenize('iff')), [(1, 0, 3)])
+        self.assertEqual(list(Tokenizer(['if', '[a-z]+', '[0-9]+']).tokenize('if12iff')),
+                         [(0, 0, 2), (2, 2, 4), (1, 4, 7)])
+
+    def test_no_token(self):
+        tokenizer = Tokenizer(['a+', 'b'])
+        self.assertIsNone(tokenizer.next_token('ca', 0))
+        with self.assertRaises(Exception):
+            list(tokenizer.tokenize('aabc'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import random
+import unittest
+from functools import lru_cache
+from reg_parser import Validator
+
+
+def derives_grammar(text: str) -> bool:
+    """
+    True if `Validator.rules` derive text, by trying every split (cubic, only for short texts)
+    every symbol derives a non empty string, so the left recursive rules always recurse on a shorter span
+    """
+
+    @lru_cache(maxsize=None)
+    def derives(symbol: str, i: int, j: int) -> bool:
+        return any(matches(tuple(rule), 0, i, j) for rule in Validator.rules[symbol])
+
+    @lru_cache(maxsize=None)
+    def matches(rule: tuple, k: int, i: int, j: int) -> bool:
+        if k == len(rule):
+            return i == j
+        item = rule[k]
+        if item not in Validator.rules:
+            return i < j and text[i] == item and matches(rule, k + 1, i + 1, j)
+        return any(derives(item, i, m) and matches(rule, k + 1, m, j) for m in range(i + 1, j - (len(rule) - k - 1) + 1))
+
+    return derives(Validator.S, 0, len(text))
+
+
+class ValidatorTest(unittest.TestCase):
+    """
+    The linear validator has to accept exactly the expressions derived by its grammar
+    """
+
+    def test_against_grammar(self):
+        rnd = random.Random(11)
+        alphabet = 'ab0.()[]-|*+?'
+        texts = {''.join(rnd.choice(alphabet) for _ in range(rnd.randint(0, 7))) for _ in range(4000)}
+        texts.update(['a|b|c', '((ab)|(a0))', '[a-b0]', '[a-bb]*', 'a?(b|0)*a+', '(a-b)', '[a-|b]', '[a|b]', '()', 'a**'])
+        valid = 0
+        for text in sorted(texts):
+            expected = derives_grammar(text)
+            valid += expected
+            self.assertEqual(Validator.validate(text), expected, text)
+        # the random texts have to reach both answers
+        self.assertGreater(valid, 50)
+
+    def test_error_position(self):
+        self.assertEqual(Validator.find_error('ab|c'), -1)
+        self.assertEqual(Validator.find_error('a**'), 2)
+        self.assertEqual(Validator.find_error('(a|)'), 3)
+        self.assertEqual(Validator.find_error('[a-'), 3)
+        self.assertEqual(Validator.find_error('(ab'), 3)
+        self.assertEqual(Validator.find_error(''), 0)
+        self.assertEqual(Validator.find_error('a$b'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+from typing import Iterator, Optional
+from compact_nfa import CompactNFA
+from dfa_generator import dfa_generator, DFA_Minimizer
+from matcher import DFAMatcher, DEAD
+from reg_parser import RegParser
+
+
+class Tokenizer:
+    """
+    A maximal munch lexer, all the token rules are compiled into a single DFA
+    rule i is rules[i], when several rules match the longest token the one listed first wins
+    """
+
+    def __init__(self, rules: list[str], engine: str = 'hopcroft'):
+        self.rules = list(rules)
+        nfa = CompactNFA.union([RegParser(rule).parse_compact() for rule in self.rules])
+        dfa = dfa_generator(nfa=nfa).convert_to_dfa()
+        minimizer = DFA_Minimizer(dfa, engine)
+        minimizer.minimize()
+        self.matcher = DFAMatcher.from_automata(minimizer.reconstruct_dfa())
+
+    def next_token(self, text: str, pos: int) -> Optional[tuple[int, int]]:
+        """
+        Returns (rule, end) of the longest non empty token starting at pos, or None
+        """
+        matcher = self.matcher
+        table, k, get_class = matcher.table, matcher.num_classes, matcher.alphabet.class_of
+        state = matcher.start
+        token = None
+        for i in range(pos, len(text)):
+            state = table[state * k + get_class(text[i])]
+            if state == DEAD:
+                break
+            if matcher.accepting[state]:
+                token = (matcher.tags[state], i + 1)
+        return token
+
+    def tokenize(self, text: str) -> Iterator[tuple[int, int, int]]:
+        """
+        Yields (rule, start, end) for every token of text in one pass
+        """
+        pos = 0
+        while pos < len(text):
+            token = self.next_token(text, pos)
+            if token is None:
+                raise Exception(f"No token rule matches at position {pos}")
+            rule, end = token
+            yield rule, pos, end
+            pos = end
@@ -0,0 +1,226 @@
+import shutil
+import subprocess
+from collections import deque
+from typing import Optional, TextIO
+from alphabet import Alphabet, DOT, compress_ranges
+from compact_nfa import EPS, NO_TAG
+from matcher import DFAMatcher, DEAD
+
+
+def draw_machine(machine):
+    """
+    Writes an interactive html view of an `AutomataMachine` to {machine.name}_FSM.html
+    it runs a physics layout in the browser, for more than a few hundred states use `write_dot`
+    """
+    import pyvis.network as net
+    import networkx as nx
+    G = nx.MultiDiGraph()
+    for state in machine.states.values():
+        # https://stackoverflow.com/questions/74082881/adding-icon-for-node-shape-using-networkx-and-pyvis-python
+        G.add_node(
+            machine.get_state_name(state.id), color='gray' if not state.id == machine.starting_state else 'orange', shape='diamond' if state.is_terminating_state else 'circle', size=10, font={'size': 8}
+        )
+
+        # merge common edges like if 2 edges like (s1,s2,"a") and (s1,s2,"b") are present, merge them to (s1,s2,"a,b")
+        merged_edges = {}
+        for k, v in state.transitions.items():
+            for dest_state in v:
+                edge = (machine.get_state_name(state.id), machine.get_state_name(dest_state), k)
+                if edge[:2] in merged_edges.keys():
+                    merged_edges[edge[:2]].append(edge[2])
+                else:
+                    merged_edges[edge[:2]] = [edge[2]]
+
+        # finally add the merged edges to the graph
+        for k, v in merged_edges.items():
+            G.add_edge(k[0], k[1], label=','.join(
+                v), color='gray' if k[1] != EPS else 'red')
+
+    nt = net.Network(notebook=True, cdn_resources='remote', directed=True)
+    nt.show_buttons(filter_=['physics'])
+    nt.set_edge_smooth('dynamic')
+    nt.from_nx(G)
+    nt.repulsion(spring_strength=0.02)
+    nt.toggle_physics(True)
+    nt.show(f'{machine.name}_FSM.html')
+
+    # write dot file to use with graphviz
+    # nx.write_dot(G, f'{machine.name}_FSM.dot')
+
+    # draw using nx instead
+    # pos = nx.planar_layout(g)
+    # plt.figure()
+    # nx.draw(g,pos,with_labels=True)
+    # plt.show()
+    # Drawing the graph
+    # First obtain the node positions using one of the layouts
+
+    # pos = nx.circular_layout(G)
+    # fig, ax = plt.subplots()
+    # nx.draw_networkx_nodes(G, pos, ax=ax)
+    # nx.draw_networkx_labels(G, pos, ax=ax)
+    # nx.draw_networkx_edges(G, pos, ax=ax)
+    # nx.draw_networkx_edges(
+    #     G, pos, ax=ax,  connectionstyle=f'arc3, rad = {0.25}')
+
+    # # nx.draw_networkx_edge_labels(G, pos, ax=ax)
+    # fig.savefig(f'{machine.name}_FSM.png', bbox_inches='tight', pad_inches=0)
+
+
+# what write_dot does with the states that can't reach a terminating state
+DEAD_MODES = ['drop', 'collapse', 'keep']
+
+
+def edge_label(alphabet: Alphabet, classes: list[int]) -> str:
+    """
+    One label for all the symbol classes going from a state to the same target, written with ranges
+    like 'a-z0-9', '[^a-c]' when the other class is included and '.' when every character is
+    """
+    chars = set()
+    for c in classes:
+        chars.update(alphabet.classes[c])
+    if Alphabet.OTHER not in classes:
+        return compress_ranges(chars)
+    excluded = alphabet.char_class.keys() - chars
+    if not excluded:
+        return DOT
+    return f'[^{compress_ranges(excluded)}]'
+
+
+def quote(text: str) -> str:
+    return '"' + text.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def live_states(matcher: DFAMatcher, incoming: list[list[int]]) -> bytearray:
+    """
+    live[s] is 1 if a terminating state can be reached from s, the other states are dead
+    """
+    live = bytearray(matcher.num_states)
+    q = deque(s for s in range(matcher.num_states) if matcher.accepting[s])
+    for s in q:
+        live[s] = 1
+    while q:
+        t = q.popleft()
+        for s in incoming[t]:
+            if not live[s]:
+                live[s] = 1
+                q.append(s)
+    return live
+
+
+def select_states(matcher: DFAMatcher, incoming: list[list[int]], live: bytearray, center: Optional[int], radius: Optional[int], max_states: Optional[int], keep_dead: bool = False) -> list[int]:
+    """
+    The states to draw in BFS order, from the start state or around center
+    around center the edges are followed both ways up to radius steps, dead states are left out unless keep_dead
+    """
+    table, k = matcher.table, matcher.num_classes
+    root = matcher.start if center is None else center
+    depth = {root: 0}
+    order = [root]
+    q = deque(order)
+    while q and (max_states is None or len(order) < max_states):
+        s = q.popleft()
+        if radius is not None and depth[s] >= radius:
+            continue
+        neighbors = [table[s * k + c] for c in range(k)]
+        if center is not None:
+            neighbors += incoming[s]
+        for t in neighbors:
+            if t == DEAD or t in depth or not (live[t] or keep_dead):
+                continue
+            depth[t] = depth[s] + 1
+            order.append(t)
+            q.append(t)
+            if max_states is not None and len(order) >= max_states:
+                break
+    return order
+
+
+def write_dot(matcher: DFAMatcher, out: TextIO, max_states: Optional[int] = None, center: Optional[int] = None,
+              radius: Optional[int] = None, dead: str = 'drop', name: str = 'DFA'):
+    """
+    Streams a graphviz DOT description of the matcher's DFA to out, straight from its table
+    the edges between two states are merged into one range label
+    max_states keeps the first states in BFS order, edges leaving them go to a single '...' node
+    center and radius draw only the neighborhood of one state
+    states that can't reach a terminating state are dead, dead='drop' leaves them and their edges out,
+    'collapse' draws them all as one 'dead' node and 'keep' draws them like the other states
+    """
+    if dead not in DEAD_MODES:
+        raise Exception(f"Unknown dead state mode {dead}")
+    table, k, alphabet = matcher.table, matcher.num_classes, matcher.alphabet
+    incoming: list[list[int]] = [[] for _ in range(matcher.num_states)]
+    for s in range(matcher.num_states):
+        row = s * k
+        for c in range(k):
+            t = table[row + c]
+            if t != DEAD:
+                incoming[t].append(s)
+    live = live_states(matcher, incoming)
+    states = select_states(matcher, incoming, live, center, radius, max_states, dead == 'keep')
+    selected = set(states)
+
+    out.write(f'digraph {quote(name)} {{\n')
+    out.write('  rankdir=LR;\n  node [shape=circle];\n')
+    if matcher.start in selected:
+        out.write(f'  start [shape=point];\n  start -> s{matcher.start};\n')
+    truncated = False
+    dead_drawn = False
+    for s in states:
+        label = str(s)
+        if matcher.tags is not None and matcher.tags[s] != NO_TAG:
+            label += f'/{matcher.tags[s]}'
+        shape = 'doublecircle' if matcher.accepting[s] else 'circle'
+        out.write(f'  s{s} [label={quote(label)}, shape={shape}];\n')
+
+        # target -> the classes going to it
+        groups: dict[int, list[int]] = {}
+        row = s * k
+        for c in range(k):
+            t = table[row + c]
+            if t != DEAD:
+                groups.setdefault(t, []).append(c)
+        # edges to the dead states or out of the drawn states are merged as well
+        merged: dict[str, list[int]] = {}
+        for t, classes in groups.items():
+            if not live[t] and dead != 'keep':
+                if dead == 'drop':
+                    continue
+                target = 'dead'
+            elif t not in selected:
+                target = 'more'
+            else:
+                target = f's{t}'
+            merged.setdefault(target, []).extend(classes)
+        for target, classes in merged.items():
+            if target == 'dead' and not dead_drawn:
+                out.write('  dead [shape=box, style=dashed];\n')
+                dead_drawn = True
+            if target == 'more' and not truncated:
+                out.write('  more [label="...", shape=plaintext];\n')
+                truncated = True
+            out.write(f'  s{s} -> {target} [label={quote(edge_label(alphabet, sorted(classes)))}];\n')
+    out.write('}\n')
+
+
+def render(matcher: DFAMatcher, path: str, format: str = 'svg', max_states: Optional[int] = 2000, **options):
+    """
+    Writes the DOT of `write_dot` to path, or runs graphviz's dot on it when format is 'svg', 'png' or 'pdf'
+    """
+    if format == 'dot':
+        with open(path, 'w', encoding='utf-8') as file:
+            write_dot(matcher, file, max_states=max_states, **options)
+        return
+    dot = shutil.which('dot')
+    if dot is None:
+        raise Exception("graphviz's dot is not installed, use format='dot'")
+    with open(path, 'wb') as file:
+        process = subprocess.Popen([dot, f'-T{format}'], stdin=subprocess.PIPE, stdout=file,
+                                   text=True, encoding='utf-8')
+        try:
+            write_dot(matcher, process.stdin, max_states=max_states, **options)
+        finally:
+            process.stdin.close()
+            code = process.wait()
+    if code != 0:
+        raise Exception(f'dot exited with code {code}')